@@ -0,0 +1,106 @@
+"""
+Compare the old per-day UNION ALL date table with the constant size
+school_days_clause predicate, for 5, 30 and 180 day ranges.
+
+    python benchmarks/date_filter.py
+"""
+import datetime
+import time
+
+import pandas as pd
+import sqlalchemy as sa
+
+from mbpy_plugin_cumulative_attendance.workweek import WorkWeek
+from mbpy_plugin_cumulative_attendance.attendance_records import school_days_clause
+
+STUDENTS = 500
+END_DATE = datetime.datetime(2023, 6, 30)
+RANGES = (5, 30, 180)
+REPEAT = 5
+
+metadata = sa.MetaData()
+attendance = sa.Table(
+    "attendance",
+    metadata,
+    sa.Column("student_id", sa.Integer),
+    sa.Column("date", sa.Date),
+    sa.Column("status", sa.String),
+)
+
+
+def union_all_dates(ww, start_date, end_date):
+    """The date table as it was built before, one SELECT per calendar day"""
+    rows = [
+        (dte.date(), dte.day_name(), not dte.dayofweek in ww.weekends)
+        for dte in pd.date_range(start=start_date, end=end_date)
+    ]
+    stmts = [
+        sa.select(
+            sa.cast(sa.literal(d), sa.String).label("date"),
+            sa.cast(sa.literal(y), sa.String).label("day"),
+            sa.cast(sa.literal(b), sa.Boolean).label("bool"),
+        )
+        if idx == 0
+        else sa.select(sa.literal(d), sa.literal(y), sa.literal(b))
+        for idx, (d, y, b) in enumerate(rows)
+    ]
+    return sa.union_all(*stmts).cte(name="date_table")
+
+
+def legacy_statement(ww, start_date, end_date):
+    dates = union_all_dates(ww, start_date, end_date)
+    return (
+        sa.select(attendance.c.student_id, dates.c.date, dates.c.day, attendance.c.status)
+        .join_from(attendance, dates, sa.cast(attendance.c.date, sa.String) == dates.c.date)
+        .where(dates.c.bool == True)
+    )
+
+
+def predicate_statement(ww, start_date, end_date):
+    return sa.select(attendance.c.student_id, attendance.c.date, attendance.c.status).where(
+        school_days_clause(attendance.c.date, ww, start_date, end_date)
+    )
+
+
+def populate(engine):
+    metadata.create_all(engine)
+    dates = pd.date_range(end=END_DATE, periods=max(RANGES) * 2)
+    with engine.begin() as connection:
+        connection.execute(
+            attendance.insert(),
+            [
+                {"student_id": student, "date": dte.date(), "status": "Present"}
+                for dte in dates
+                for student in range(STUDENTS)
+            ],
+        )
+
+
+def measure(engine, build, ww, start_date, end_date):
+    best = None
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        stmt = build(ww, start_date, end_date)
+        sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+        with engine.connect() as connection:
+            rows = len(connection.execute(stmt).all())
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return len(sql), rows, best
+
+
+def main():
+    engine = sa.create_engine("sqlite://")
+    populate(engine)
+    ww = WorkWeek("mon-fri")
+
+    print(f"{'days':>5} {'method':>10} {'sql chars':>10} {'rows':>8} {'ms':>9}")
+    for days in RANGES:
+        start_date = END_DATE - datetime.timedelta(days=days - 1)
+        for name, build in (("union_all", legacy_statement), ("predicate", predicate_statement)):
+            size, rows, elapsed = measure(engine, build, ww, start_date, END_DATE)
+            print(f"{days:>5} {name:>10} {size:>10} {rows:>8} {elapsed * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
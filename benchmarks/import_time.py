@@ -0,0 +1,76 @@
+"""
+Time importing the three plugin modules the way mbpy does to list its
+commands, with python -X importtime, and check that none of them pulls in
+pandas, numpy, jinja2 or the mbpy importers before a command runs.
+
+    python benchmarks/import_time.py
+
+Whatever mbpy itself loads for every command (click, rich and its settings
+context) is imported first and not counted. Exits with status 1 when the
+plugin modules take longer than BUDGET_MS, best of REPEAT runs, or import a
+heavy module.
+"""
+import subprocess
+import sys
+
+PLUGINS = (
+    "mbpy_plugin_cumulative_attendance.homerooms",
+    "mbpy_plugin_cumulative_attendance.classes",
+    "mbpy_plugin_cumulative_attendance.combo",
+)
+MBPY = ("click", "rich.console", "rich.table", "mbpy.cli.formatted_click", "mbpy.cli.contexts")
+HEAVY = ("pandas", "numpy", "pyarrow", "jinja2", "mbpy.cli.importers", "mbpy.cli.bulk", "mbpy.exchanges")
+BUDGET_MS = 50
+REPEAT = 5
+
+
+def import_times():
+    """Cumulative microseconds of each plugin module and every module imported along with them"""
+    code = f"import {', '.join(MBPY)}; import {', '.join(PLUGINS)}"
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    times, imported, started = {}, [], False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        module = name.strip()
+        started = started or module.startswith("mbpy_plugin_cumulative_attendance")
+        if not started:
+            continue
+        imported.append(module)
+        if module in PLUGINS and not name.startswith("  "):
+            times[module] = int(cumulative)
+    return times, imported
+
+
+def main():
+    best, imported = None, []
+    for _ in range(REPEAT):
+        times, imported = import_times()
+        if best is None or sum(times.values()) < sum(best.values()):
+            best = times
+
+    for module, microseconds in best.items():
+        print(f"{module:>48} {microseconds / 1000:>8.1f} ms")
+    total = sum(best.values()) / 1000
+    print(f"{'total':>48} {total:>8.1f} ms (budget {BUDGET_MS} ms)")
+
+    heavy = [
+        name
+        for name in HEAVY
+        if any(module == name or module.startswith(name + ".") for module in imported)
+    ]
+    if heavy:
+        print(f"imported before any command runs: {', '.join(heavy)}")
+    if heavy or total > BUDGET_MS:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
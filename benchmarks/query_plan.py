@@ -0,0 +1,82 @@
+"""
+Print the EXPLAIN plan and timing of both attendance queries for a one week
+report on a synthetic term, without the (date, student_id) indexes from
+create_attendance_indexes and then with them.
+
+    python benchmarks/query_plan.py --students 2000 --days 120
+
+tests/test_query_plan.py checks that the queries use the indexes.
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from sqlalchemy.orm import Session
+
+from mbpy_plugin_cumulative_attendance.attendance_records import (
+    attendance_indexes,
+    classes_attendance_statement,
+    create_attendance_indexes,
+    explain,
+    get_classes_attendance_records,
+    get_homeroom_attendance_records,
+    homeroom_attendance_statement,
+)
+from mbpy_plugin_cumulative_attendance.workweek import WorkWeek
+
+from synthetic import generate
+
+QUERIES = (
+    ("class", classes_attendance_statement, get_classes_attendance_records),
+    ("homeroom", homeroom_attendance_statement, get_homeroom_attendance_records),
+)
+REPEAT = 3
+
+
+def measure(session, get_records, start_date, end_date, ww):
+    best = None
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        rows = len(get_records(session, start_date, end_date, ww))
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return rows, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--days", type=int, default=60)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), f"query-plan-{args.students}-{args.days}.sqlite")
+    engine, dates = generate(path, students=args.students, classes=args.classes, days=args.days)
+    ww = WorkWeek("mon-fri")
+    ## The last week of the term, out of the whole term's history
+    start_date = datetime.datetime.combine(dates[-5], datetime.time())
+    end_date = datetime.datetime.combine(dates[-1], datetime.time())
+
+    with Session(engine) as session:
+        for index in attendance_indexes():
+            index.drop(session.connection(), checkfirst=True)
+        session.commit()
+
+        for label in ("without indexes", "with indexes"):
+            if label == "with indexes":
+                create_attendance_indexes(session)
+            for name, statement, get_records in QUERIES:
+                _, stmt = statement(start_date, end_date, ww)
+                plan = [" ".join(str(value) for value in row) for row in explain(session, stmt)]
+                rows, elapsed = measure(session, get_records, start_date, end_date, ww)
+                print(f"{name} {label}: {rows} rows in {elapsed * 1000:.1f} ms")
+                for line in plan:
+                    print(f"    {line}")
+
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
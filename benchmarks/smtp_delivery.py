@@ -0,0 +1,108 @@
+"""
+Send a batch of report sized messages through delivery.SMTPPool to a local
+stand-in SMTP server: one connection per message against pooled
+connections, and with the server dropping every 25th message to exercise
+the retries.
+
+    python benchmarks/smtp_delivery.py
+"""
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import socketserver
+import threading
+import time
+
+from mbpy_plugin_cumulative_attendance.delivery import SMTPPool
+
+MESSAGES = 200
+BODY_BYTES = 20_000
+
+
+class StandIn(socketserver.ThreadingTCPServer):
+    """An SMTP sink that counts connections and messages, optionally failing some"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, fail_every=None):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.attempts = 0
+        self.received = 0
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 stand-in ready")
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.reply("250 stand-in")
+            elif command == b"MAIL":
+                with server.lock:
+                    server.attempts += 1
+                    failing = server.fail_every and server.attempts % server.fail_every == 0
+                if failing:
+                    self.reply("421 try again later")
+                    return
+                self.reply("250 ok")
+            elif command == b"DATA":
+                self.reply("354 end with .")
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                with server.lock:
+                    server.received += 1
+                self.reply("250 queued")
+            elif command == b"QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+def messages():
+    for i in range(MESSAGES):
+        message = MIMEMultipart()
+        message["From"] = "reports@example.com"
+        message["To"] = f"advisor{i}@example.com"
+        message["Subject"] = f"Attendance {i}"
+        message.attach(MIMEText("x" * BODY_BYTES, "plain"))
+        yield message, "reports@example.com", [f"advisor{i}@example.com"]
+
+
+def run(name, fail_every=None, **pool_options):
+    server = StandIn(fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    began = time.perf_counter()
+    with SMTPPool(host, port, backoff=0.01, **pool_options) as pool:
+        errors = pool.send_all(messages())
+    elapsed = time.perf_counter() - began
+    server.shutdown()
+    server.server_close()
+    failed = sum(error is not None for error in errors)
+    print(
+        f"{name:>22} {server.received:>8} {failed:>6} {server.connections:>11}"
+        f" {MESSAGES / elapsed:>9.0f}"
+    )
+
+
+def main():
+    print(f"{'':>22} {'received':>8} {'failed':>6} {'connections':>11} {'msgs/s':>9}")
+    run("connection per message", max_per_connection=1)
+    run("one pooled connection")
+    run("four pooled", size=4)
+    run("four pooled, flaky", fail_every=25, size=4)
+
+
+if __name__ == "__main__":
+    main()
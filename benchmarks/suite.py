@@ -0,0 +1,109 @@
+"""
+Time each stage of the reports on a synthetic database: both attendance
+queries, the cumulative counts, attendance rates, the report tables and
+combo's mismatch detection.
+
+    python benchmarks/suite.py --students 2000 --classes 120 --days 60
+
+The database is generated into --db unless it exists already, so later runs
+at the same scale skip straight to the timings; pass --regenerate to rebuild it.
+"""
+import argparse
+import datetime
+import os
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from mbpy_plugin_cumulative_attendance.analytics import attendance_rates
+from mbpy_plugin_cumulative_attendance.attendance_records import (
+    get_classes_attendance_records,
+    get_homeroom_attendance_records,
+)
+from mbpy_plugin_cumulative_attendance.calculate import build_cumulative_status_is_active
+from mbpy_plugin_cumulative_attendance.discrepancies import find_discrepancies
+from mbpy_plugin_cumulative_attendance.reports import ReportBuilder
+from mbpy_plugin_cumulative_attendance.workweek import WorkWeek
+
+from synthetic import generate, school_days
+
+HOMEROOM_INDEX = ["Student Id", "Student Name", "Grade", "Grade #", "Homeroom Advisor"]
+HOMEROOM_COLUMNS = ["Grade", "Grade #", "Homeroom Advisor"]
+CLASS_INDEX = ["Student Id", "Student Name", "Class", "Grade", "Grade #", "Day", "Period"]
+CLASS_COLUMNS = ["Grade", "Grade #"]
+END_DATE = datetime.date(2023, 6, 30)
+
+
+def measure(build, repeat):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = build()
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def report(name, rows, elapsed):
+    print(f"{name:>28} {rows:>10} {elapsed * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--days", type=int, default=20)
+    parser.add_argument("--db", help="SQLite file, by default one per scale in the temp directory")
+    parser.add_argument("--regenerate", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(
+        os.environ.get("TMPDIR", "/tmp"),
+        f"attendance-{args.students}-{args.classes}-{args.days}.sqlite",
+    )
+    if args.regenerate or not os.path.exists(path):
+        began = time.perf_counter()
+        generate(path, students=args.students, classes=args.classes, days=args.days)
+        print(f"generated {path} in {time.perf_counter() - began:.1f}s")
+    engine = sa.create_engine(f"sqlite:///{path}")
+    dates = school_days(END_DATE, args.days)
+    start_date = datetime.datetime.combine(dates[0], datetime.time())
+    end_date = datetime.datetime.combine(dates[-1], datetime.time())
+    ww = WorkWeek("mon-fri")
+
+    def query(get_records):
+        with Session(engine) as session:
+            return get_records(session, start_date, end_date, ww)
+
+    print(f"{'stage':>28} {'rows':>10} {'ms':>10}")
+    classes_df, elapsed = measure(lambda: query(get_classes_attendance_records), args.repeat)
+    report("class query", len(classes_df), elapsed)
+    homeroom_df, elapsed = measure(lambda: query(get_homeroom_attendance_records), args.repeat)
+    report("homeroom query", len(homeroom_df), elapsed)
+
+    for name, raw_df in (("class", classes_df), ("homeroom", homeroom_df)):
+        cumulative, elapsed = measure(lambda: build_cumulative_status_is_active(raw_df), args.repeat)
+        report(f"{name} cumulative", len(cumulative), elapsed)
+        rates, elapsed = measure(
+            lambda: attendance_rates(raw_df, ww.school_days(start_date, end_date)), args.repeat
+        )
+        report(f"{name} attendance rates", len(rates), elapsed)
+
+    for name, raw_df, index, columns in (
+        ("class", classes_df, CLASS_INDEX, CLASS_COLUMNS),
+        ("homeroom", homeroom_df, HOMEROOM_INDEX, HOMEROOM_COLUMNS),
+    ):
+        builder, elapsed = measure(lambda: ReportBuilder(raw_df, index, columns), args.repeat)
+        report(f"{name} tally", len(raw_df), elapsed)
+        for table in ("status_breakdown", "absent_days", "not_present"):
+            result, elapsed = measure(lambda: builder.build([table])[table], args.repeat)
+            report(f"{name} {table}", len(result), elapsed)
+
+    finals, elapsed = measure(lambda: find_discrepancies(homeroom_df, classes_df), args.repeat)
+    report("discrepancies", sum(len(final) for final in finals.values()), elapsed)
+
+
+if __name__ == "__main__":
+    main()
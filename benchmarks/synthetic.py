@@ -0,0 +1,195 @@
+"""
+Generate a synthetic SQLite database with the mbpy.db.schema tables the
+reports read: year groups, teachers, students, classes, memberships and a
+term of homeroom and class attendance.
+
+    python benchmarks/synthetic.py --students 2000 --classes 120 --days 60 /tmp/attendance.sqlite
+"""
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from mbpy.db.schema import (
+    Class,
+    ClassAttendanceByDate,
+    HRAttendanceByDate,
+    Membership,
+    Student,
+    Teacher,
+    YearGroup,
+)
+
+GRADES = range(6, 13)
+STATUSES = ["Present", "Absent", "Late", "Excused"]
+STATUS_WEIGHTS = [0.86, 0.07, 0.05, 0.02]
+NOTES = ["", "", "", "sick", "appointment", "family"]
+STUDENTS_PER_ADVISOR = 20
+INSERT_CHUNK = 50_000
+
+
+def school_days(end_date, days):
+    """The last days weekdays up to end_date, Monday to Friday"""
+    return [day.date() for day in pd.bdate_range(end=end_date, periods=days)]
+
+
+def insert(session, model, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        session.execute(sa.insert(model), rows[start : start + INSERT_CHUNK])
+
+
+def generate(
+    path,
+    students=500,
+    classes=40,
+    days=20,
+    classes_per_student=6,
+    end_date=datetime.date(2023, 6, 30),
+    seed=0,
+):
+    """Create path with the given number of students, classes and school days"""
+    rng = np.random.default_rng(seed)
+    engine = sa.create_engine(f"sqlite:///{path}")
+    for model in (YearGroup, Teacher, Student, Class, Membership, ClassAttendanceByDate, HRAttendanceByDate):
+        model.__table__.drop(engine, checkfirst=True)
+        model.__table__.create(engine)
+
+    grades = list(GRADES)
+    advisors = max(1, students // STUDENTS_PER_ADVISOR)
+    student_grades = rng.choice(grades, size=students)
+    student_advisors = rng.integers(1, advisors + 1, size=students)
+    dates = school_days(end_date, days)
+
+    with Session(engine) as session:
+        insert(
+            session,
+            YearGroup,
+            [
+                {"id": i + 1, "name": f"Grade {grade}", "program": "MYP" if grade < 11 else "DP"}
+                for i, grade in enumerate(grades)
+            ],
+        )
+        insert(
+            session,
+            Teacher,
+            [
+                {"id": i + 1, "full_name": f"Advisor {i}", "email": f"advisor{i}@example.com"}
+                for i in range(advisors)
+            ],
+        )
+        insert(
+            session,
+            Student,
+            [
+                {
+                    "id": i + 1,
+                    "student_id": f"S{i:06d}",
+                    "display_name": f"Student {i}",
+                    "class_grade": f"Grade {grade}",
+                    "class_grade_number": int(grade) + 1,
+                    "year_group_id": grades.index(grade) + 1,
+                    "homeroom_advisor_id": int(advisor),
+                }
+                for i, (grade, advisor) in enumerate(zip(student_grades, student_advisors))
+            ],
+        )
+        insert(
+            session,
+            Class,
+            [
+                {
+                    "id": i + 1,
+                    "name": f"Class {i}",
+                    "program_code": "MYP" if i % 2 else "DP",
+                    "archived": bool(rng.random() < 0.05),
+                }
+                for i in range(classes)
+            ],
+        )
+
+        ## Each student takes classes_per_student distinct classes, one per period
+        per_student = min(classes_per_student, classes)
+        enrolled = np.argsort(rng.random((students, classes)), axis=1)[:, :per_student] + 1
+        insert(
+            session,
+            Membership,
+            [
+                {
+                    "class_id": int(class_id),
+                    "user_id": student + 1,
+                    "deleted_at": datetime.datetime(2023, 1, 1) if rng.random() < 0.01 else None,
+                }
+                for student in range(students)
+                for class_id in enrolled[student]
+            ],
+        )
+
+        for date in dates:
+            homeroom = rng.choice(STATUSES, size=students, p=STATUS_WEIGHTS)
+            notes = rng.choice(NOTES, size=students)
+            insert(
+                session,
+                HRAttendanceByDate,
+                [
+                    {
+                        "student_id": student + 1,
+                        "year_group_id": grades.index(student_grades[student]) + 1,
+                        "date": date,
+                        "status": homeroom[student],
+                        "note": notes[student],
+                    }
+                    for student in range(students)
+                ],
+            )
+
+            ## Students absent from homeroom mostly miss their classes too
+            lessons = rng.choice(STATUSES, size=(students, per_student), p=STATUS_WEIGHTS)
+            missed = (homeroom == "Absent")[:, None] & (rng.random((students, per_student)) < 0.8)
+            lessons[missed] = "Absent"
+            notes = rng.choice(NOTES, size=(students, per_student))
+            insert(
+                session,
+                ClassAttendanceByDate,
+                [
+                    {
+                        "student_id": student + 1,
+                        "class_id": int(enrolled[student, period]),
+                        "date": date,
+                        "period": str(period + 1),
+                        "status": lessons[student, period],
+                        "note": notes[student, period],
+                    }
+                    for student in range(students)
+                    for period in range(per_student)
+                ],
+            )
+        session.commit()
+
+    return engine, dates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--classes", type=int, default=40)
+    parser.add_argument("--days", type=int, default=20)
+    parser.add_argument("--classes-per-student", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    _, dates = generate(
+        args.path,
+        students=args.students,
+        classes=args.classes,
+        days=args.days,
+        classes_per_student=args.classes_per_student,
+        seed=args.seed,
+    )
+    print(f"{args.path}: {args.students} students, {args.classes} classes, {dates[0]} to {dates[-1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Render a 500 row cumulative table with the old nested loop, inline style
+template, compiled on every run, against the report_table macro: once
+loading the compiled template from the bytecode cache as a new run would,
+and once from the environment cached within a run.
+
+    python benchmarks/template_render.py
+"""
+import datetime
+import pathlib
+import time
+import types
+
+import jinja2
+import numpy as np
+import pandas as pd
+
+from mbpy_plugin_cumulative_attendance import render
+
+ROWS = 500
+REPEAT = 5
+TEMPLATE = pathlib.Path(__file__).parent.parent / "templates" / "cumulative_hr.html"
+
+LEGACY_TABLE = """
+<table style="border: 1px solid black; border-collapse: collapse;">
+    <thead>
+        <tr style="border-top: 1px solid black;">
+            <th style="font-weight: 900; padding: 10px; color: #eee; background-color: #999;">{{ data.df.index.name }}</th>
+            {% for column_name in data.df.columns -%}
+            <td style="font-weight: 900; padding: 10px; color: #eee; background-color: #999;">{{ column_name }}</td>
+            {% endfor -%}
+        </tr>
+    </thead>
+    <tbody>
+        {% set values = data.df.values -%}
+        {% for grade in data.df.index -%}
+        <tr style="border-top: 1px solid black">
+            {% if grade == 'Total' -%}
+            <th style="font-size:smaller; padding: 10px;background-color: #FF9300;">{{ grade }}</th>
+            {% else -%}
+            <th style="font-size:smaller; padding: 10px;background-color: #FFC600;">{{ grade }}</th>
+            {% endif -%}
+            {% set row_index = loop.index0 -%}
+            {% set row = values[row_index] -%}
+            {% for value in row -%}
+                {% if grade == 'Total' -%}
+            <td style="text-align: center; padding: 10px; font-weight: 900; background-color: #FF9300;">{{ value }}</td>
+                {% else -%}
+            <td style="text-align: center;padding: 10px;{{ 'font-style: italic;background-color: #eee;' if loop.index == 1 else ''}}">{{ value }}</td>
+                {% endif -%}
+            {% endfor -%}
+        </tr>
+        {% endfor -%}
+    </tbody>
+</table>
+"""
+
+
+def cumulative_frame(seed=0):
+    rng = np.random.default_rng(seed)
+    grade_number = rng.integers(6, 13, ROWS)
+    return pd.DataFrame(
+        {
+            "Student Name": [f"Student {i}" for i in range(ROWS)],
+            "Grade": [f"Grade {g}" for g in grade_number],
+            "Grade #": grade_number,
+            **{status: rng.integers(0, 20, ROWS) for status in ("Absent", "Excused", "Late", "Present")},
+        },
+        index=pd.Index([f"S{i:05d}" for i in range(ROWS)], name="Student Id"),
+    )
+
+
+def measure(build):
+    best = None
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        html = build()
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return html, best
+
+
+def legacy(df):
+    now = datetime.datetime.now()
+    data = types.SimpleNamespace(subject="Attendance", today=now.date(), now=now, df=df)
+    return jinja2.Template(LEGACY_TABLE).render(data=data)
+
+
+def new_run(df):
+    render.template_environment.cache_clear()
+    return render.render_report(TEMPLATE, df, subject="Attendance", start_date=datetime.datetime.now())
+
+
+def cached(df):
+    return render.render_report(TEMPLATE, df, subject="Attendance", start_date=datetime.datetime.now())
+
+
+def main():
+    df = cumulative_frame()
+    cached(df)
+    print(f"{ROWS} rows")
+    print(f"{'method':>28} {'kB':>7} {'ms':>9}")
+    for name, build in (
+        ("inline styles, compiled", legacy),
+        ("macro, bytecode cache", new_run),
+        ("macro, cached environment", cached),
+    ):
+        html, elapsed = measure(lambda: build(df))
+        print(f"{name:>28} {len(html) / 1024:>7.1f} {elapsed * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
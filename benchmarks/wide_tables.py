@@ -0,0 +1,99 @@
+"""
+Compare the pivot plus dict based DataFrame.replace filling the absent and
+not present tables used before with the mask based wide_table, on a
+2,000 student by 60 school day frame.
+
+    python benchmarks/wide_tables.py
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from mbpy_plugin_cumulative_attendance.reports import wide_table
+
+STUDENTS = 2000
+DAYS = 60
+REPEAT = 5
+INDEX = ["Student Id", "Student Name", "Grade", "Grade #"]
+
+
+def raw_frame(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2023-06-30", periods=DAYS).strftime("%Y-%m-%d")
+    students = np.arange(STUDENTS)
+    grade_number = students % 7 + 6
+    frame = pd.DataFrame(
+        {
+            "Student Id": np.tile(students.astype(str), DAYS),
+            "Student Name": np.tile([f"Student {i}" for i in students], DAYS),
+            "Grade": pd.Categorical(np.tile([f"Grade {g}" for g in grade_number], DAYS)),
+            "Grade #": np.tile(grade_number, DAYS),
+            "Date": np.repeat(dates, STUDENTS),
+            "Status": pd.Categorical(
+                rng.choice(["Present", "Absent", "Late"], size=STUDENTS * DAYS, p=[0.8, 0.12, 0.08])
+            ),
+            "Note": rng.choice(["", "", "", "sick", "appointment"], size=STUDENTS * DAYS),
+        }
+    )
+    return frame
+
+
+def legacy_absent_days(raw_df):
+    absent = raw_df.loc[raw_df["Status"] == "Absent"]
+    table = absent.pivot(index=INDEX, columns=["Date"], values=["Note"])
+    return table.replace({col: np.nan for col in table.columns}, "-").replace(
+        {col: "" for col in table.columns}, '"Absent"'
+    )
+
+
+def mask_absent_days(raw_df):
+    absent = raw_df.loc[raw_df["Status"] == "Absent"]
+    return wide_table(absent, INDEX, "Note", missing="-", empty='"Absent"')
+
+
+def legacy_not_present(raw_df):
+    non_present = raw_df.loc[raw_df["Status"] != "Present"]
+    non_present = non_present.assign(
+        Summary=non_present["Status"].astype(str) + ' "' + non_present["Note"] + '"'
+    )
+    table = non_present.pivot(index=INDEX, columns=["Date"], values=["Summary"])
+    return table.fillna("Present")
+
+
+def mask_not_present(raw_df):
+    non_present = raw_df.loc[raw_df["Status"] != "Present"]
+    non_present = non_present.assign(
+        Summary=non_present["Status"].astype(str) + ' "' + non_present["Note"] + '"'
+    )
+    return wide_table(non_present, INDEX, "Summary", missing="Present")
+
+
+def measure(build, raw_df):
+    best = None
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        table = build(raw_df)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return table, best
+
+
+def main():
+    raw_df = raw_frame()
+    print(f"{STUDENTS} students x {DAYS} days, {len(raw_df)} rows")
+    print(f"{'table':>12} {'method':>8} {'shape':>12} {'ms':>9}")
+    for name, legacy, masked in (
+        ("absent_days", legacy_absent_days, mask_absent_days),
+        ("not_present", legacy_not_present, mask_not_present),
+    ):
+        expected, legacy_time = measure(legacy, raw_df)
+        table, mask_time = measure(masked, raw_df)
+        pd.testing.assert_frame_equal(table, expected.astype(object), check_names=False)
+        shape = "x".join(map(str, table.shape))
+        print(f"{name:>12} {'replace':>8} {shape:>12} {legacy_time * 1000:>9.1f}")
+        print(f"{name:>12} {'mask':>8} {shape:>12} {mask_time * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
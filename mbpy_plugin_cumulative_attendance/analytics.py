@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+from .calculate import last_rows
+
+# Trailing windows, in school days, over which absences are rated
+ROLLING_WINDOWS = (10, 20)
+
+# Share of a window's recorded days absent at which a student counts as chronically absent
+CHRONIC_RATE = 0.1
+
+
+def attendance_matrix(raw_df, school_days, absent_statuses=("Absent",)):
+    """
+    Dense student by school day boolean matrices of the raw records: whether
+    each student has a record that day, and whether they were absent for all
+    of it (every period, for class records).
+
+    Returns the student ids, in sorted order, with the recorded and absent
+    matrices. Records on days that are not in school_days, or without a
+    student id, are left out.
+    """
+    school_days = np.asarray(school_days, dtype="datetime64[D]")
+    student_codes, students = pd.factorize(raw_df["Student Id"], sort=True)
+    days = raw_df["Date"].to_numpy(dtype="datetime64[D]")
+    day_codes = np.searchsorted(school_days, days)
+    in_range = (day_codes < len(school_days)) & (student_codes >= 0)
+    in_range[in_range] = school_days[day_codes[in_range]] == days[in_range]
+
+    shape = (len(students), len(school_days))
+    flat = student_codes[in_range] * shape[1] + day_codes[in_range]
+    is_absent = raw_df["Status"].isin(absent_statuses).to_numpy()[in_range]
+    records = np.bincount(flat, minlength=shape[0] * shape[1]).reshape(shape)
+    absences = np.bincount(flat, weights=is_absent, minlength=shape[0] * shape[1]).reshape(shape)
+
+    recorded = records > 0
+    return np.asarray(students, dtype=object), recorded, recorded & (absences == records)
+
+
+def longest_runs(matrix):
+    """
+    Length of the run of True each cell of matrix ends, counted along its rows
+    """
+    counts = np.cumsum(matrix, axis=1)
+    at_reset = np.where(matrix, 0, counts)
+    return counts - np.maximum.accumulate(at_reset, axis=1)
+
+
+def window_sums(matrix, window):
+    """Sums of every window consecutive columns of each row of matrix"""
+    counts = np.cumsum(matrix, axis=1)
+    counts = np.concatenate([np.zeros((len(matrix), 1), dtype=counts.dtype), counts], axis=1)
+    return counts[:, window:] - counts[:, :-window]
+
+
+def attendance_rates(
+    raw_df,
+    school_days,
+    absent_statuses=("Absent",),
+    unique=None,
+    windows=ROLLING_WINDOWS,
+    chronic_rate=CHRONIC_RATE,
+    earlier_df=None,
+    earlier_days=(),
+):
+    """
+    Attendance percentage, absence streaks and rolling window chronic absence
+    flags of every student in raw_df, worked out together on the matrices of
+    attendance_matrix.
+
+    Days without a record for a student count neither way and break a
+    streak. earlier_df holds the records of earlier_days, the school days
+    right before the range, so that the windows can reach back their full
+    length; only the windows themselves look at them. Each window runs back
+    from the last school day, and Most absent in N days is the highest count
+    over every window of that length ending in the range. Windows longer
+    than all the days given are left out.
+    """
+    if unique is None:
+        unique = ["Student Id", "Student Name", "Grade", "Grade #"]
+
+    earlier_days = np.asarray(earlier_days, dtype="datetime64[D]")
+    days = np.concatenate([earlier_days, np.asarray(school_days, dtype="datetime64[D]")])
+    records = raw_df[["Student Id", "Date", "Status"]]
+    if earlier_df is not None and len(earlier_df):
+        earlier = earlier_df[["Student Id", "Date", "Status"]]
+        records = pd.concat(
+            [earlier[earlier["Student Id"].isin(raw_df["Student Id"])], records],
+            ignore_index=True,
+        )
+
+    students, all_recorded, all_absent = attendance_matrix(records, days, absent_statuses)
+    if not len(students):
+        return pd.DataFrame(columns=unique)
+    recorded = all_recorded[:, len(earlier_days) :]
+    absent = all_absent[:, len(earlier_days) :]
+
+    ## In the sorted student order of the matrices
+    rates = last_rows(raw_df, unique)
+
+    recorded_days = recorded.sum(axis=1)
+    absent_days = absent.sum(axis=1)
+    runs = longest_runs(absent)
+    rates["School days"] = recorded.shape[1]
+    rates["Recorded days"] = recorded_days
+    rates["Absent days"] = absent_days
+    rates["Attendance %"] = np.round(
+        100 * (recorded_days - absent_days) / np.maximum(recorded_days, 1), 1
+    )
+    rates["Longest absence streak"] = runs.max(axis=1, initial=0)
+    rates["Current absence streak"] = runs[:, -1] if runs.shape[1] else 0
+
+    windows = [window for window in windows if 0 < window <= len(days)] if recorded.shape[1] else []
+    for window in sorted(windows):
+        ## Only the windows that end on a school day of the range
+        first = max(len(earlier_days) - window + 1, 0)
+        absent_in = window_sums(all_absent, window)[:, first:]
+        recorded_in = window_sums(all_recorded, window)[:, first:]
+        rate = absent_in[:, -1] / np.maximum(recorded_in[:, -1], 1)
+        rates[f"Absent in last {window} days"] = absent_in[:, -1]
+        rates[f"Most absent in {window} days"] = absent_in.max(axis=1)
+        rates[f"Chronic in last {window} days"] = rate >= chronic_rate
+
+    return rates.sort_values(
+        by=["Attendance %", "Grade #", "Student Name"], ascending=[True, False, True]
+    ).reset_index(drop=True)
@@ -1,24 +1,163 @@
+import calendar
+
+import numpy as np
 import pandas as pd
-from mbpy.db.schema import Student, Class, ClassAttendanceByDate, Membership
+from pandas.api.types import union_categoricals
+from mbpy.db.schema import (
+    Student,
+    Class,
+    ClassAttendanceByDate,
+    Membership,
+    YearGroup,
+    HRAttendanceByDate,
+    Teacher,
+)
 import sqlalchemy as sa
 from sqlalchemy import and_
+from sqlalchemy.orm import aliased
 
+# Rows fetched from the server per round trip when streaming results
+CHUNK_SIZE = 10_000
 
-def get_classes_attendance_records(session, start_date, end_date, dates_subquery):
-    day_records = []
-    attendance_records = (
-        session.query(Student, Class, dates_subquery, ClassAttendanceByDate)
-        .select_from(Student)
-        .join(dates_subquery, dates_subquery.c.bool == True)
-        .join(
-            ClassAttendanceByDate,
-            and_(
-                ClassAttendanceByDate.student_id == Student.id,
-                ClassAttendanceByDate.class_id == Class.id,
-                ClassAttendanceByDate.date == dates_subquery.c.date,
-                ClassAttendanceByDate.status.is_not(None),
-            ),
-        )
+# Weekday names in a fixed order, so Day has the same categories in every frame
+DAY_DTYPE = pd.CategoricalDtype(list(calendar.day_name))
+
+# Name and table of each (date, student_id) index, letting the range predicates
+# on date seek straight to the report's days with student_id alongside for the
+# join to students; made on demand by create_attendance_indexes
+ATTENDANCE_INDEXES = (
+    ("ix_class_attendance_bydate_date_student_id", ClassAttendanceByDate),
+    ("ix_hr_attendance_bydate_date_student_id", HRAttendanceByDate),
+)
+
+
+def records_to_frame(
+    result, columns, categorical=(), integer=(), dates=(), chunk_size=CHUNK_SIZE
+):
+    """
+    Build a dataframe column-wise from a streamed result of plain column tuples,
+    without going through per-row ORM entities or dicts
+    """
+    chunks = {name: [] for name in columns}
+    for partition in result.partitions(chunk_size):
+        for name, values in zip(columns, zip(*partition)):
+            if name in categorical:
+                chunks[name].append(pd.Categorical(values))
+            elif name in integer:
+                chunks[name].append(np.fromiter(values, dtype=np.int64, count=len(values)))
+            elif name in dates:
+                ## A chunk spans a handful of days, so only its distinct dates are
+                ## converted; converting every date object one by one is far slower
+                codes, days = pd.factorize(np.fromiter(values, dtype=object, count=len(values)))
+                chunks[name].append(np.array(list(days), dtype="datetime64[ns]")[codes])
+            else:
+                chunks[name].append(np.array(values, dtype=object))
+
+    data = {}
+    for name, parts in chunks.items():
+        if name in categorical:
+            data[name] = union_categoricals(parts) if parts else pd.Categorical([])
+        elif name in integer:
+            data[name] = np.concatenate(parts) if parts else np.array([], dtype=np.int64)
+        elif name in dates:
+            data[name] = np.concatenate(parts) if parts else np.array([], dtype="datetime64[ns]")
+        else:
+            data[name] = np.concatenate(parts) if parts else np.array([], dtype=object)
+
+    return pd.DataFrame(data, columns=list(columns))
+
+
+def concat_records(frames):
+    """
+    Stack frames fetched separately, keeping their categorical columns categorical
+    """
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    combined = pd.concat(frames, ignore_index=True)
+    for name, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            combined[name] = union_categoricals([frame[name] for frame in frames])
+    return combined
+
+
+def with_calendar_columns(df):
+    """
+    Derive the weekday name of each date next to it
+    """
+    day = pd.Categorical.from_codes(df["Date"].dt.dayofweek.to_numpy(), dtype=DAY_DTYPE)
+    df.insert(df.columns.get_loc("Date") + 1, "Day", day)
+    return df
+
+
+def school_days_clause(date_column, ww, start_date, end_date):
+    """
+    Restrict date_column to the school days between start_date and end_date;
+    the statement grows with the holidays in range, not with its length
+    """
+    clause = and_(
+        date_column >= start_date.date(),
+        date_column <= end_date.date(),
+        sa.extract("dow", date_column).not_in(ww.sql_weekends),
+    )
+    holidays = ww.holidays_between(start_date, end_date)
+    if holidays:
+        clause = and_(clause, date_column.not_in(holidays))
+    return clause
+
+
+def attendance_indexes():
+    """
+    ATTENDANCE_INDEXES as sa.Index objects, on copies of their tables in a
+    metadata of their own, so mbpy's metadata (and its create_all) never gains them
+    """
+    metadata = sa.MetaData()
+    indexes = []
+    for name, model in ATTENDANCE_INDEXES:
+        table = model.__table__.to_metadata(metadata)
+        indexes.append(sa.Index(name, table.c.date, table.c.student_id))
+    return indexes
+
+
+def create_attendance_indexes(session):
+    """
+    Create whichever of ATTENDANCE_INDEXES the database does not have yet
+    """
+    connection = session.connection()
+    for index in attendance_indexes():
+        index.create(connection, checkfirst=True)
+    session.commit()
+
+
+def explain(session, statement):
+    """
+    The database's plan for statement, one tuple per row of its EXPLAIN output
+    """
+    dialect = session.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    return [tuple(row) for row in session.connection().exec_driver_sql(prefix + sql)]
+
+
+def classes_attendance_statement(start_date, end_date, ww, chunk_size=CHUNK_SIZE):
+    """
+    The columns and statement get_classes_attendance_records fetches
+    """
+    columns = {
+        "Student Id": Student.student_id,
+        "Student Name": Student.display_name,
+        "Class": Class.name,
+        "Grade": Student.class_grade,
+        "Grade #": Student.class_grade_number - 1,
+        "Program": Class.program_code,
+        "Date": ClassAttendanceByDate.date,
+        "Period": ClassAttendanceByDate.period,
+        "Status": ClassAttendanceByDate.status,
+        "Note": ClassAttendanceByDate.note,
+    }
+    statement = (
+        sa.select(*columns.values())
+        .select_from(ClassAttendanceByDate)
+        .join(Student, ClassAttendanceByDate.student_id == Student.id)
+        .join(Class, ClassAttendanceByDate.class_id == Class.id)
         .join(
             Membership,
             and_(
@@ -26,61 +165,86 @@ def get_classes_attendance_records(session, start_date, end_date, dates_subquery
                 Membership.user_id == ClassAttendanceByDate.student_id,
             ),
         )
-        .where(ClassAttendanceByDate.date >= start_date.date())
-        .where(ClassAttendanceByDate.date <= end_date.date())
+        .where(school_days_clause(ClassAttendanceByDate.date, ww, start_date, end_date))
+        .where(ClassAttendanceByDate.status.is_not(None))
         .where(Membership.deleted_at.is_(None))
         .where(Class.archived == False)
-        .where(dates_subquery.c.bool == True)
+        .execution_options(yield_per=chunk_size)
     )
+    return columns, statement
+
 
-    for (
-        student,
-        class_,
-        date,
-        day,
-        _,
-        class_attendance,
-    ) in attendance_records.all():
-        day_record = {
-            "Student Id": student.student_id,
-            "Student Name": student.display_name,
-            "Class": class_.name,
-            "Grade": student.class_grade,
-            "Grade #": student.class_grade_number - 1,
-            "Program": class_.program_code,
-            "Date": date,
-            "Day": day,
-            "Period": class_attendance.period,
-            "Status": class_attendance.status,
-            "Note": class_attendance.note,
-        }
-        day_records.append(day_record)
-
-    return pd.DataFrame.from_records(day_records)
-
-
-def get_dates_subquery(ww, start_date, end_date):
-    date_df = pd.DataFrame(
-        pd.date_range(start=start_date, end=end_date), columns=["date"]
+def get_classes_attendance_records(session, start_date, end_date, ww, chunk_size=CHUNK_SIZE):
+    columns, attendance_records = classes_attendance_statement(start_date, end_date, ww, chunk_size)
+    raw_df = records_to_frame(
+        session.execute(attendance_records),
+        columns,
+        categorical=("Class", "Grade", "Program", "Status"),
+        integer=("Grade #",),
+        dates=("Date",),
+        chunk_size=chunk_size,
     )
+    return with_calendar_columns(raw_df)
+
+
+def homeroom_attendance_statement(start_date, end_date, ww, chunk_size=CHUNK_SIZE):
+    """
+    The columns and statement get_homeroom_attendance_records fetches
+    """
+    TeacherAlias = aliased(Teacher, flat=True)
 
-    rows = [
-        (dte.date(), dte.day_name(), not dte.dayofweek in ww.weekends)
-        for dte in date_df["date"]
-    ]
-
-    stmts = [
-        sa.select(
-            *[
-                sa.cast(sa.literal(d), sa.String).label("date"),
-                sa.cast(sa.literal(y), sa.String).label("day"),
-                sa.cast(sa.literal(b), sa.Boolean).label("bool"),
-            ]
+    columns = {
+        "Student Id": Student.student_id,
+        "Student Name": Student.display_name,
+        "Year Group": YearGroup.name,
+        "Homeroom Advisor": TeacherAlias.full_name,
+        "Grade": Student.class_grade,
+        "Grade #": Student.class_grade_number - 1,
+        "Program": YearGroup.program,
+        "Date": HRAttendanceByDate.date,
+        "Status": HRAttendanceByDate.status,
+        "Note": HRAttendanceByDate.note,
+    }
+    statement = (
+        sa.select(*columns.values())
+        .select_from(YearGroup)
+        .join(Student, Student.year_group_id == YearGroup.id)
+        .join(TeacherAlias, Student.homeroom_advisor_id == TeacherAlias.id)
+        .join(
+            HRAttendanceByDate,
+            and_(
+                HRAttendanceByDate.student_id == Student.id,
+                HRAttendanceByDate.year_group_id == YearGroup.id,
+            ),
         )
-        if idx == 0
-        else sa.select(*[sa.literal(d), sa.literal(y), sa.literal(b)])
-        for idx, (d, y, b) in enumerate(rows)
-    ]
-    subquery_table = sa.union_all(*stmts)
+        .where(school_days_clause(HRAttendanceByDate.date, ww, start_date, end_date))
+        .where(HRAttendanceByDate.status.is_not(None))
+        .execution_options(yield_per=chunk_size)
+    )
+    return columns, statement
+
 
-    return subquery_table.cte(name="date_table")
+def get_homeroom_attendance_records(session, start_date, end_date, ww, chunk_size=CHUNK_SIZE):
+    columns, attendance_records = homeroom_attendance_statement(start_date, end_date, ww, chunk_size)
+    raw_df = records_to_frame(
+        session.execute(attendance_records),
+        columns,
+        categorical=("Year Group", "Homeroom Advisor", "Grade", "Program", "Status"),
+        integer=("Grade #",),
+        dates=("Date",),
+        chunk_size=chunk_size,
+    )
+    return with_calendar_columns(raw_df)
+
+
+def get_homeroom_advisor_emails(session):
+    """
+    Email address of every homeroom advisor, by the name the homeroom records carry
+    """
+    advisors = (
+        sa.select(Teacher.full_name, Teacher.email)
+        .join(Student, Student.homeroom_advisor_id == Teacher.id)
+        .where(Teacher.email.is_not(None))
+        .distinct()
+    )
+    return {name: email for name, email in session.execute(advisors)}
@@ -1,18 +1,77 @@
+import numpy as np
 import pandas as pd
 
 
+def last_rows(df, columns, student_codes=None):
+    """
+    columns of each student's last row in df, in the order of their codes,
+    which are those of pd.factorize(df[columns[0]], sort=True) unless given.
+    Rows coded -1, without a student id, are left out.
+    """
+    if student_codes is None:
+        student_codes, _ = pd.factorize(df[columns[0]], sort=True)
+    _, from_end = np.unique(student_codes[::-1], return_index=True)
+    rows = len(df) - 1 - from_end
+    rows = rows[student_codes[rows] >= 0]
+    return df[columns].iloc[rows].reset_index(drop=True)
+
+
 def build_cumulative_status_is_active(
-    df: pd.DataFrame, absent_column_name="Absent", unique=None
+    df: pd.DataFrame, absent_column_name="Absent", unique=None, absent_like=(), top_n=None
 ):
-    """ Count how many """
+    """
+    Count how many times each student had each status, most absent first
+
+    Statuses are counted on student id codes alone, and the rest of unique is
+    joined back from each student's last row. absent_like are further statuses
+    ranked together with absent_column_name, and top_n keeps only that many
+    of the most absent students.
+    """
     if df.empty:
         return df
 
     if unique is None:
         unique = ["Student Id", "Student Name", "Grade", "Grade #"]
 
-    indexes = [df[col] for col in unique]
+    student_codes, students = pd.factorize(df[unique[0]], sort=True)
+    status_codes, statuses = pd.factorize(df["Status"], sort=True)
+    ## Rows without a student id or status are left out, as crosstab would
+    counted = (student_codes >= 0) & (status_codes >= 0)
+    counts = np.bincount(
+        student_codes[counted] * len(statuses) + status_codes[counted],
+        minlength=len(students) * len(statuses),
+    ).reshape(len(students), len(statuses))
+    seen = counts.any(axis=0)
+    counts, statuses = counts[:, seen], np.asarray(statuses, dtype=object)[seen]
+
+    attributes = last_rows(df, unique, student_codes)
+
+    status_counts = pd.concat(
+        [
+            attributes,
+            pd.DataFrame(counts, columns=statuses),
+        ],
+        axis=1,
+    )
+    status_counts.columns.name = "Status"
+    return most_absent(status_counts, [absent_column_name, *absent_like], top_n)
+
+
+def most_absent(status_counts, absent_columns, top_n=None):
+    """
+    Students ordered by their count of absent_columns and then grade, both
+    descending; with top_n, only the first top_n of them, picked out with a
+    partial selection before the rows that are left get sorted
+    """
+    absent_columns = [column for column in absent_columns if column in status_counts.columns]
+    absent = status_counts[absent_columns].to_numpy().sum(axis=1)
+    grade = status_counts["Grade #"].to_numpy()
+
+    rows = np.arange(len(status_counts))
+    if top_n is not None and top_n < len(rows):
+        ## Keep every row tied with the last one in, so the sort below decides ties
+        nth = np.argpartition(-absent, top_n - 1)[top_n - 1]
+        rows = np.flatnonzero(absent >= absent[nth])
 
-    status_counts = pd.crosstab(index=indexes, columns=df['Status']).reset_index()
-    status_counts = status_counts.sort_values(by=[absent_column_name, "Grade #"], ascending=False)
-    return status_counts
+    order = rows[np.lexsort((-grade[rows], -absent[rows]))][:top_n]
+    return status_counts.iloc[order]
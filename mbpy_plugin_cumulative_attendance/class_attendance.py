@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from .attendance_records import DAY_DTYPE
+from .calculate import last_rows
+from .reports import by_student, scatter_table
+
+# Columns of the class wide tables, the same index ReportBuilder is given for classes
+class_index = ["Student Id", "Student Name", "Class", "Grade", "Grade #", "Day", "Period"]
+
+# Attributes of a student, taken from their last record by last_rows
+student_columns = ["Student Id", "Student Name", "Grade", "Grade #"]
+
+
+def small_codes(codes, count):
+    """codes in the narrowest signed integer type that holds count values and -1"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if count <= np.iinfo(dtype).max:
+            return codes.astype(dtype)
+    return codes.astype(np.int64)
+
+
+class ClassAttendance:
+    """
+    Class attendance as arrays over student, date and lesson codes, a lesson
+    being the nth record of a student on a date in the order they were fetched.
+
+    Each cell holds a small integer status, class and period code, -1 where
+    there is no record; notes are only kept for the cells that have one. The
+    class wide tables and combo's mismatches are read off these by indexing,
+    instead of grouping and pivoting rows of strings.
+    """
+
+    def __init__(self, raw_df):
+        ## Null keys get a code of their own, last, as pivot keeps them under
+        ## their own null label; a -1 would land on another record's cell
+        student_codes, student_ids = pd.factorize(
+            raw_df["Student Id"], sort=True, use_na_sentinel=False
+        )
+        date_codes, self.dates = pd.factorize(raw_df["Date"], sort=True)
+        status_codes, self.statuses = pd.factorize(raw_df["Status"], sort=True, use_na_sentinel=False)
+        class_codes, self.classes = pd.factorize(raw_df["Class"], sort=True, use_na_sentinel=False)
+        period_codes, self.periods = pd.factorize(raw_df["Period"], sort=True, use_na_sentinel=False)
+
+        ## Lesson: how many records of the same student and date came before
+        pairs = student_codes.astype(np.int64) * len(self.dates) + date_codes
+        order = np.argsort(pairs, kind="stable")
+        sorted_pairs = pairs[order]
+        starts = np.flatnonzero(np.r_[True, sorted_pairs[1:] != sorted_pairs[:-1]])
+        lessons = np.empty(len(pairs), dtype=np.int64)
+        lessons[order] = np.arange(len(pairs)) - np.repeat(
+            starts, np.diff(np.r_[starts, len(pairs)])
+        )
+
+        lesson_count = int(lessons.max()) + 1 if len(pairs) else 0
+        self.shape = (len(student_ids), len(self.dates), lesson_count)
+        cells = pairs * self.shape[2] + lessons
+        size = int(np.prod(self.shape))
+        self.status, self.class_codes, self.period_codes = (
+            np.full(size, -1, dtype=small_codes(codes, len(labels)).dtype)
+            for codes, labels in (
+                (status_codes, self.statuses),
+                (class_codes, self.classes),
+                (period_codes, self.periods),
+            )
+        )
+        self.status[cells] = status_codes
+        self.class_codes[cells] = class_codes
+        self.period_codes[cells] = period_codes
+
+        notes = raw_df["Note"].to_numpy(dtype=object)
+        with_note = np.flatnonzero(notes != "")
+        order = np.argsort(cells[with_note])
+        self.note_cells = cells[with_note][order]
+        self.note_values = notes[with_note][order]
+
+        self.students = last_rows(raw_df, student_columns, student_codes)
+
+    def status_code(self, status):
+        found = np.flatnonzero(np.asarray(self.statuses, dtype=object) == status)
+        return int(found[0]) if len(found) else -2
+
+    def cells(self):
+        """Every recorded cell, grouped by student and date and in fetch order within them"""
+        return np.flatnonzero(self.status >= 0)
+
+    def coordinates(self, cells):
+        """Student, date and lesson codes of cells"""
+        return np.unravel_index(cells, self.shape)
+
+    def notes(self, cells):
+        """The note of each of cells, "" where there is none"""
+        notes = np.full(len(cells), "", dtype=object)
+        if len(self.note_cells):
+            at = np.minimum(np.searchsorted(self.note_cells, cells), len(self.note_cells) - 1)
+            found = self.note_cells[at] == cells
+            notes[found] = self.note_values[at[found]]
+        return notes
+
+    def status_names(self, cells):
+        return np.asarray(self.statuses, dtype=object)[self.status[cells]]
+
+    def class_names(self, cells):
+        return np.asarray(self.classes, dtype=object)[self.class_codes[cells]]
+
+    def wide_table(self, cells, values, cell_values, missing, empty=None):
+        """
+        The wide table of cell_values at cells, with a row for each student,
+        class, weekday and period, as reports.wide_table lays it out
+        """
+        students, dates, _ = self.coordinates(cells)
+        weekdays = self.dates.dayofweek.to_numpy()[dates]
+        keys = (
+            (students.astype(np.int64) * len(self.classes) + self.class_codes[cells]) * 7
+            + weekdays
+        ) * len(self.periods) + self.period_codes[cells]
+        row_codes, row_keys = pd.factorize(keys, sort=True)
+        row_keys, periods = np.divmod(row_keys, len(self.periods))
+        row_keys, weekdays = np.divmod(row_keys, 7)
+        row_students, classes = np.divmod(row_keys, len(self.classes))
+
+        attributes = self.students.iloc[row_students]
+        row_index = pd.MultiIndex.from_arrays(
+            [
+                attributes["Student Id"].array,
+                attributes["Student Name"].array,
+                self.classes.take(classes),
+                attributes["Grade"].array,
+                attributes["Grade #"].array,
+                pd.Categorical.from_codes(weekdays, dtype=DAY_DTYPE),
+                self.periods.take(periods),
+            ],
+            names=class_index,
+        )
+        date_codes, dates = pd.factorize(self.dates.take(dates), sort=True)
+        return scatter_table(
+            row_codes, row_index, date_codes, dates, cell_values, values, missing, empty
+        )
+
+    def absent_days(self, absent_category_name="Absent"):
+        """ReportBuilder.absent_days of the class records"""
+        cells = np.flatnonzero(self.status == self.status_code(absent_category_name))
+        return by_student(
+            self.wide_table(cells, "Note", self.notes(cells), missing="-", empty='"Absent"')
+        )
+
+    def not_present(self):
+        """ReportBuilder.not_present of the class records"""
+        cells = np.flatnonzero((self.status >= 0) & (self.status != self.status_code("Present")))
+        notes = self.notes(cells)
+        ## A null note leaves the summary null, so the cell reads Present as it always has
+        summaries = np.where(
+            pd.isna(notes), None, self.status_names(cells) + ' "' + notes.astype(str) + '"'
+        )
+        return by_student(self.wide_table(cells, "Summary", summaries, missing="Present"))
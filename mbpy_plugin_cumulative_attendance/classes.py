@@ -1,17 +1,44 @@
 from mbpy.cli.formatted_click import click
 from mbpy.cli.formatted_click import RichClickGroup, RichClickCommand
-from .workweek import WorkWeek
-from .attendance_records import get_dates_subquery, get_classes_attendance_records
-from mbpy.cli.contexts import ImportContext, pass_settings_context
-from mbpy.cli.bulk import bulk_import_all
-from mbpy.cli.importers import import_class_attendance_bydates
-import pandas as pd
-import numpy as np
-from .utils import multi_index_readable
-from .calculate import build_cumulative_status_is_active
-from .utils import smtp_shared_options, command_shared_options
-from mbpy.exchanges.smtp_exchange import message_exchange, smtp_exchange
-import pathlib
+from mbpy.cli.contexts import pass_settings_context
+from .utils import smtp_shared_options, command_shared_options, report_range, school_calendar
+from .profiling import NO_PROFILER, Profiler
+import functools
+
+
+def class_tables(
+    raw_df, cumulative, attendance_rates, absent_category_name="Absent", profiler=NO_PROFILER
+):
+    """
+    The tables of a class report, around the cumulative counts and
+    attendance rates worked out beforehand
+    """
+    from .reports import ReportBuilder
+    from .class_attendance import ClassAttendance, class_index
+
+    with profiler.phase("class tally") as phase:
+        builder = ReportBuilder(
+            raw_df,
+            index=class_index,
+            columns=["Grade", "Grade #"],
+            absent_category_name=absent_category_name,
+        )
+        phase.rows = len(raw_df)
+    ## The wide per date tables come from the coded class arrays instead
+    with profiler.phase("class attendance arrays") as phase:
+        attendance = ClassAttendance(raw_df)
+        phase.rows = len(raw_df)
+    tables = dict(cumulative=cumulative, attendance_rates=attendance_rates)
+    views = {
+        "not_present": attendance.not_present,
+        "status_breakdown": builder.status_breakdown,
+        "absent_days": lambda: attendance.absent_days(absent_category_name),
+    }
+    for name, view in views.items():
+        with profiler.phase(f"class {name}") as phase:
+            tables[name] = view()
+            phase.rows = len(tables[name])
+    return tables
 
 
 @click.command("cumulative-class-attendance", cls=RichClickCommand)
@@ -25,6 +52,7 @@ def cli(
     scope,
     date,
     work_week,
+    holidays,
     import_,
     from_,
     to_,
@@ -36,133 +64,119 @@ def cli(
     tls,
     template,
     manual_statuses,
+    compression,
+    compress_above,
     absent_category_name,
+    absent_like,
+    top_absent,
+    cumulative_store,
+    cumulative_from,
+    start,
+    partition_workers,
+    create_indexes,
+    cache_dir,
+    cache_max_size,
+    cache_max_age,
+    output_dir,
+    output_format,
+    profile,
+    profile_trace,
+    profile_cprofile,
     reports = True
 ):
     """Output for class attendance"""
-    end_date = date
-    ww = WorkWeek(work_week)
-    if scope in ["weekly", "monthly"]:
-        if scope == 'weekly':
-            start_date = ww.first_day_of_week(end_date)
-    elif scope == "daily":
-        start_date = end_date
-    else:
-        raise NotImplemented
-
-    start_date = ww.first_day_of_week(end_date)
+    from mbpy.cli.importers import import_class_attendance_bydates
+    from mbpy.exchanges.smtp_exchange import message_exchange, smtp_exchange
+    from .attendance_records import get_classes_attendance_records
+    from .pipeline import report_tables
+    from .send_email import csv_attachment
+    from .render import attach_report
 
+    profiler = Profiler.for_context(ctx, profile, profile_trace, profile_cprofile)
+    end_date = date
+    ww = school_calendar(work_week, holidays)
+    start_date, end_date = report_range(ww, scope, end_date, start)
 
-    if import_:
-        ctx.obj = ImportContext(incrementally=True, include_archived=True)
-        ctx.invoke(bulk_import_all)
-        ctx.invoke(
-            import_class_attendance_bydates,
-            start_date=start_date,
-            end_date=end_date,
-            weekends=ww.weekends,
-        )
-
-    subquery = get_dates_subquery(ww, start_date, end_date)
-
-    with settings_obj.Session() as session:
-        raw_df = get_classes_attendance_records(session, start_date, end_date, subquery)
+    tables = report_tables(
+        ctx,
+        settings_obj,
+        "class",
+        get_classes_attendance_records,
+        import_class_attendance_bydates,
+        functools.partial(
+            class_tables, absent_category_name=absent_category_name, profiler=profiler
+        ),
+        ww,
+        start_date,
+        end_date,
+        work_week=work_week,
+        import_=import_,
+        absent_category_name=absent_category_name,
+        absent_like=absent_like,
+        top_absent=top_absent,
+        cumulative_store=cumulative_store,
+        cumulative_from=cumulative_from,
+        partition_workers=partition_workers,
+        create_indexes=create_indexes,
+        cache_dir=cache_dir,
+        cache_max_size=cache_max_size,
+        cache_max_age=cache_max_age,
+        output_dir=output_dir,
+        output_format=output_format,
+        profiler=profiler,
+        reports=reports,
+    )
+    raw_df = tables["raw"]
+    if raw_df.empty:
+        print('no records!')
+        return raw_df
 
     if reports:
-        cumulative = build_cumulative_status_is_active(
-            raw_df, absent_column_name=absent_category_name
-        )
+        cumulative = tables["cumulative"]
         for manual_status in manual_statuses:
             if manual_status not in cumulative.columns:
                 cumulative[manual_status] = 0
 
-        status_counts = (
-            raw_df.rename(columns={"Student Id": "Count"})
-            .pivot_table(
-                index=["Status"],
-                columns=["Grade", "Grade #"],
-                values=["Count"],
-                aggfunc="count",
-                margins=True,
-                margins_name="Total",
-            )
-            .fillna(0)
-            .sort_values(by=["Status"], ascending=True)
-        )
-        status_counts = multi_index_readable(status_counts, sort_by=2)
-
-        status_breakdown = (
-            raw_df.rename(columns={"Student Id": "# students"})
-            .pivot_table(
-                index=["Date", "Status"],
-                columns=["Grade", "Grade #"],
-                values=["# students"],
-                aggfunc="count",
-                margins=True,
-                margins_name="Total",
-            )
-            .fillna(0)
-        )
-        status_breakdown = multi_index_readable(status_breakdown, sort_by=2)
-
-        absent_days = raw_df.loc[raw_df["Status"] == "Absent"].pivot(
-            index=[
-                "Student Id",
-                "Student Name",
-                "Class",
-                "Grade",
-                "Grade #",
-                "Day",
-                "Period",
-            ],
-            columns=["Date"],
-            values=["Note"],
-        )
-
-        absent_days = (
-            absent_days.replace({col: np.nan for col in absent_days.columns}, "-")
-            .replace({col: "" for col in absent_days.columns}, '"Absent"')
-            .sort_values(by=["Grade #", "Student Name"])
-        )
-        absent_days = multi_index_readable(absent_days, has_margins=False)
-
-        raw_df["Summary"] = raw_df["Status"] + ' "' + raw_df["Note"] + '"'
-        student_non_present_summary = raw_df.loc[raw_df["Status"] != "Present"].pivot(
-            index=[
-                "Student Id",
-                "Student Name",
-                "Class",
-                "Grade",
-                "Grade #",
-                "Day",
-                "Period",
-            ],
-            columns=["Date"],
-            values=["Summary"],
-        )
-        student_non_present_summary = student_non_present_summary.replace(
-            {col: np.nan for col in student_non_present_summary.columns}, "Present"
-        ).sort_values(by=["Grade #", "Student Name"])
-        student_non_present_summary = multi_index_readable(
-            student_non_present_summary, has_margins=False
-        )
-
+        cumulative = cumulative.set_index("Student Id")
         message = message_exchange(
             from_,
             to_,
             subject,
             body or "",
-            attachments=[
-                ("cumulative_absences", "df", cumulative.set_index("Student Id")),
-                ("non_presents", None, student_non_present_summary),
-                ("status_breakdown", None, status_breakdown),
-                ("absent_days", None, absent_days),
-                ("raw_data", None, raw_df),
-            ],
-            template=pathlib.Path(template) if template else None,
+            attachments=[("cumulative_absences", "df", cumulative)],
+            template=None,
             start_date=start_date,
             end_date=end_date,
         )
-        smtp_exchange(message, tls, host, port, from_, password)
+        if template:
+            with profiler.phase("class render"):
+                attach_report(
+                    message,
+                    template,
+                    cumulative,
+                    subject=subject,
+                    start_date=start_date,
+                    end_date=end_date,
+                )
+        ## Tables the template does not use, raw_data above all, are streamed
+        ## in as CSV parts of their own instead of going through message_exchange
+        with profiler.phase("class attachments"):
+            for name, table in (
+                ("attendance_rates", tables["attendance_rates"]),
+                ("non_presents", tables["not_present"]),
+                ("status_breakdown", tables["status_breakdown"]),
+                ("absent_days", tables["absent_days"]),
+                ("raw_data", raw_df),
+            ):
+                message.attach(
+                    csv_attachment(
+                        f"{name}.csv",
+                        table,
+                        compression=compression,
+                        compress_above=compress_above * 1024 * 1024,
+                    )
+                )
+        with profiler.phase("class send"):
+            smtp_exchange(message, tls, host, port, from_, password)
 
     return raw_df
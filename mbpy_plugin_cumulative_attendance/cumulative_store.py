@@ -0,0 +1,135 @@
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects.sqlite import insert
+from .calculate import last_rows, most_absent
+
+metadata = sa.MetaData()
+
+daily_counts = sa.Table(
+    "daily_status_counts",
+    metadata,
+    sa.Column("report", sa.String, primary_key=True),
+    sa.Column("student_id", sa.String, primary_key=True),
+    sa.Column("date", sa.Date, primary_key=True),
+    sa.Column("status", sa.String, primary_key=True),
+    sa.Column("count", sa.Integer, nullable=False),
+)
+
+students = sa.Table(
+    "students",
+    metadata,
+    sa.Column("report", sa.String, primary_key=True),
+    sa.Column("student_id", sa.String, primary_key=True),
+    sa.Column("student_name", sa.String),
+    sa.Column("grade", sa.String),
+    sa.Column("grade_number", sa.Integer),
+)
+
+student_columns = {
+    "Student Id": "student_id",
+    "Student Name": "student_name",
+    "Grade": "grade",
+    "Grade #": "grade_number",
+}
+
+
+class CumulativeStore:
+    """
+    Per student, per date, per status counts kept in a local SQLite file, so
+    that cumulative counts over any range can be read back without going
+    through the attendance tables again
+    """
+
+    def __init__(self, path):
+        self.engine = sa.create_engine(f"sqlite:///{path}")
+        metadata.create_all(self.engine)
+
+    def update(self, report, raw_df, start_date, end_date):
+        """
+        Replace the stored counts between start_date and end_date with the ones in raw_df
+        """
+        counts = (
+            raw_df.assign(date=pd.to_datetime(raw_df["Date"]).dt.date)
+            .groupby(["Student Id", "date", "Status"], observed=True)
+            .size()
+            .reset_index(name="count")
+            .rename(columns={"Student Id": "student_id", "Status": "status"})
+            .assign(report=report)
+        )
+        counts["status"] = counts["status"].astype(str)
+        details = (
+            last_rows(raw_df, list(student_columns))
+            .rename(columns=student_columns)
+            .astype({"grade": str, "grade_number": int})
+            .assign(report=report)
+        )
+
+        with self.engine.begin() as connection:
+            connection.execute(
+                daily_counts.delete()
+                .where(daily_counts.c.report == report)
+                .where(daily_counts.c.date >= start_date.date())
+                .where(daily_counts.c.date <= end_date.date())
+            )
+            if not counts.empty:
+                connection.execute(daily_counts.insert(), counts.to_dict("records"))
+            if not details.empty:
+                upsert = insert(students)
+                connection.execute(
+                    upsert.on_conflict_do_update(
+                        index_elements=[students.c.report, students.c.student_id],
+                        set_={
+                            column: upsert.excluded[column]
+                            for column in ("student_name", "grade", "grade_number")
+                        },
+                    ),
+                    details.to_dict("records"),
+                )
+
+    def cumulative(
+        self, report, start_date, end_date, absent_column_name="Absent", absent_like=(), top_n=None
+    ):
+        """
+        Status counts per student between start_date and end_date, shaped
+        like build_cumulative_status_is_active's output
+        """
+        query = (
+            sa.select(
+                students.c.student_id,
+                students.c.student_name,
+                students.c.grade,
+                students.c.grade_number,
+                daily_counts.c.status,
+                sa.func.sum(daily_counts.c.count).label("count"),
+            )
+            .join_from(
+                daily_counts,
+                students,
+                sa.and_(
+                    students.c.report == daily_counts.c.report,
+                    students.c.student_id == daily_counts.c.student_id,
+                ),
+            )
+            .where(daily_counts.c.report == report)
+            .where(daily_counts.c.date >= start_date.date())
+            .where(daily_counts.c.date <= end_date.date())
+            .group_by(
+                students.c.student_id,
+                students.c.student_name,
+                students.c.grade,
+                students.c.grade_number,
+                daily_counts.c.status,
+            )
+        )
+        with self.engine.connect() as connection:
+            totals = pd.DataFrame(connection.execute(query).all(), columns=[*student_columns, "Status", "count"])
+
+        status_counts = (
+            totals.pivot(index=list(student_columns), columns="Status", values="count")
+            .fillna(0)
+            .astype(int)
+            .reset_index()
+        )
+        if absent_column_name not in status_counts.columns:
+            status_counts[absent_column_name] = 0
+        return most_absent(status_counts, [absent_column_name, *absent_like], top_n)
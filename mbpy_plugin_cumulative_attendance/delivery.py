@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+import smtplib
+import ssl
+import threading
+import time
+
+# Port on which the connection is TLS from the start rather than upgraded with STARTTLS
+IMPLICIT_TLS_PORT = 465
+
+
+def is_transient(error):
+    """
+    Whether sending again later could succeed: the connection dropped, or the
+    server answered with a 4xx code
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    ## Timeouts, resets and the like
+    return isinstance(error, OSError)
+
+
+class _Slot:
+    """One pooled connection, opened when first needed"""
+
+    def __init__(self):
+        self.smtp = None
+        self.sent = 0
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+        self.smtp = None
+        self.sent = 0
+
+
+class SMTPPool:
+    """
+    A small pool of authenticated SMTP connections shared by many messages.
+
+    Connections are opened on first use and opened again once they have
+    carried max_per_connection messages or the server dropped them. Sends
+    are spaced out to stay under max_per_minute, and transient failures are
+    retried up to retries times with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        host,
+        port=None,
+        username=None,
+        password=None,
+        tls=False,
+        size=1,
+        retries=3,
+        backoff=1.0,
+        max_per_minute=None,
+        max_per_connection=100,
+        timeout=60,
+    ):
+        self.host = host
+        self.port = int(port) if port else 0
+        self.username = username
+        self.password = password
+        self.tls = tls
+        self.size = size
+        self.retries = retries
+        self.backoff = backoff
+        self.interval = 60 / max_per_minute if max_per_minute else 0
+        self.max_per_connection = max_per_connection
+        self.timeout = timeout
+
+        self._slots = Queue()
+        for _ in range(size):
+            self._slots.put(_Slot())
+        self._lock = threading.Lock()
+        self._next_send = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for _ in range(self.size):
+            self._slots.get().close()
+        for _ in range(self.size):
+            self._slots.put(_Slot())
+
+    def _connect(self):
+        context = ssl.create_default_context()
+        if self.port == IMPLICIT_TLS_PORT:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=context)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.tls:
+                smtp.starttls(context=context)
+        if self.password:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    def _throttle(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_send - now
+            self._next_send = max(now, self._next_send) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def send(self, message, from_addr=None, to_addrs=None):
+        """
+        Send one message over a pooled connection, returning the recipients the
+        server refused; raises once retries are used up or on a permanent failure
+        """
+        slot = self._slots.get()
+        try:
+            for attempt in range(self.retries + 1):
+                self._throttle()
+                try:
+                    if slot.smtp is None or slot.sent >= self.max_per_connection:
+                        slot.close()
+                        slot.smtp = self._connect()
+                    refused = slot.smtp.send_message(message, from_addr, to_addrs)
+                    slot.sent += 1
+                    return refused
+                except Exception as error:
+                    if not is_transient(error) or attempt == self.retries:
+                        raise
+                    slot.close()
+                    time.sleep(self.backoff * 2**attempt)
+        finally:
+            self._slots.put(slot)
+
+    def send_all(self, deliveries):
+        """
+        Send each (message, from_addr, to_addrs) of deliveries, size at a time,
+        and return the error of each one, None for those that went out
+        """
+
+        def deliver(delivery):
+            try:
+                self.send(*delivery)
+            except (smtplib.SMTPException, OSError) as error:
+                return error
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            return list(pool.map(deliver, deliveries))
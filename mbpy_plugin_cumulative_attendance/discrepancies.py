@@ -0,0 +1,202 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+from .class_attendance import ClassAttendance
+
+delim = ": "
+
+on_ = ["Student Id", "Date"]
+
+# Column order of the count table, indexed by 2 * is_homeroom + is_absent
+count_columns = [
+    "Count of Classes Not Absent",
+    "Count of Classes Absent",
+    "Count of Homeroom Not Absent",
+    "Count of Homeroom Absent",
+]
+
+homeroom_columns = [
+    "Student Name",
+    "Year Group",
+    "Homeroom Advisor",
+    "Grade",
+    "Grade #",
+]
+
+# name, homeroom count that must be exactly one, class count that must be positive
+scenarios = [
+    (
+        "students_marked_absent_in_homeroom_but_not_uniformally_absent_from_classes",
+        "Count of Homeroom Absent",
+        "Count of Classes Not Absent",
+    ),
+    (
+        "students_marked_not_absent_in_homeroom_but_absent_in_classes",
+        "Count of Homeroom Not Absent",
+        "Count of Classes Absent",
+    ),
+]
+
+
+def status_note(status, note):
+    """Status, followed by the quoted note when there is one"""
+    status = pd.Series(status).astype(str).to_numpy(dtype=object)
+    note = pd.Series(note).fillna("").astype(str).to_numpy(dtype=object)
+    return np.where(
+        np.char.strip(note.astype(str)) == "",
+        status,
+        status + delim + '"' + note + '"',
+    )
+
+
+class AttendanceCounts:
+    """
+    Homeroom rows and the recorded cells of a ClassAttendance coded onto shared
+    (student, date) pairs, with the absent and not absent counts of each pair
+    from a single bincount
+    """
+
+    def __init__(self, homeroom_df, classes, absent_category_name="Absent"):
+        ## Records without a student id are left out, as grouping on on_ leaves them out
+        homeroom_df = homeroom_df.loc[homeroom_df["Student Id"].notna().to_numpy()]
+        self.homeroom_df = homeroom_df
+        self.classes = classes
+
+        ## Class cells come grouped by student and date, in fetch order within them
+        class_cells = classes.cells()
+        class_ids = classes.students["Student Id"].to_numpy(dtype=object)[
+            classes.coordinates(class_cells)[0]
+        ]
+        self.class_cells = class_cells[pd.notna(class_ids)]
+        class_students, class_dates, _ = classes.coordinates(self.class_cells)
+        student_codes, self.students = pd.factorize(
+            np.concatenate(
+                [
+                    classes.students["Student Id"].to_numpy(dtype=object)[class_students],
+                    homeroom_df["Student Id"].to_numpy(dtype=object),
+                ]
+            ),
+            sort=True,
+        )
+        date_codes, self.dates = pd.factorize(
+            np.concatenate(
+                [
+                    classes.dates.to_numpy()[class_dates],
+                    homeroom_df["Date"].to_numpy(dtype=classes.dates.dtype),
+                ]
+            ),
+            sort=True,
+        )
+        keys = student_codes.astype(np.int64) * len(self.dates) + date_codes
+        pair_codes, self.pair_keys = pd.factorize(keys, sort=True)
+
+        n_classes = len(self.class_cells)
+        self.class_pairs, self.homeroom_pairs = pair_codes[:n_classes], pair_codes[n_classes:]
+        self.class_absent = (
+            classes.status[self.class_cells] == classes.status_code(absent_category_name)
+        )
+        self.homeroom_absent = (homeroom_df["Status"] == absent_category_name).to_numpy()
+
+        column = np.concatenate(
+            [self.class_absent, 2 + self.homeroom_absent.astype(np.int64)]
+        )
+        self.counts = np.bincount(
+            pair_codes * 4 + column, minlength=len(self.pair_keys) * 4
+        ).reshape(-1, 4)
+
+    def table(self):
+        """The backbone table: absent and not absent counts per student and date"""
+        table = pd.DataFrame(self.counts, columns=count_columns)
+        table.insert(0, "Student Id", self.students[self.pair_keys // len(self.dates)])
+        table.insert(1, "Date", self.dates[self.pair_keys % len(self.dates)])
+        return table
+
+    def mismatches(self, homeroom_column, classes_column):
+        """
+        Student days with exactly one homeroom row counted in homeroom_column and
+        at least one class counted in classes_column, with those classes laid
+        out side by side as Class1, StatusNote1, Class2, StatusNote2, ...
+        """
+        homeroom_index = count_columns.index(homeroom_column)
+        classes_index = count_columns.index(classes_column)
+        selected = (self.counts[:, homeroom_index] == 1) & (self.counts[:, classes_index] > 0)
+        pairs = np.flatnonzero(selected)
+
+        ## The homeroom row of every selected pair
+        homeroom_rows = np.flatnonzero(
+            selected[self.homeroom_pairs] & (self.homeroom_absent == bool(homeroom_index & 1))
+        )
+        homeroom_at = np.empty(len(self.pair_keys), dtype=np.int64)
+        homeroom_at[self.homeroom_pairs[homeroom_rows]] = homeroom_rows
+        homeroom = self.homeroom_df.iloc[homeroom_at[pairs]]
+
+        ## Class cells of the selected pairs, grouped by pair in their original order
+        class_rows = np.flatnonzero(
+            selected[self.class_pairs] & (self.class_absent == bool(classes_index & 1))
+        )
+        class_rows = class_rows[np.argsort(self.class_pairs[class_rows], kind="stable")]
+        class_pairs = self.class_pairs[class_rows]
+        starts = np.flatnonzero(np.r_[True, class_pairs[1:] != class_pairs[:-1]])
+        slot = np.arange(len(class_rows)) - np.repeat(starts, np.diff(np.r_[starts, len(class_rows)]))
+        row = np.searchsorted(pairs, class_pairs)
+
+        ## One scatter into the wide layout instead of pivoting classes and notes separately
+        width = int(slot.max()) + 1 if len(slot) else 0
+        wide = np.full((len(pairs), 2 * width), "", dtype=object)
+        cells = self.class_cells[class_rows]
+        wide[row, 2 * slot] = self.classes.class_names(cells).astype(str)
+        wide[row, 2 * slot + 1] = status_note(
+            self.classes.status_names(cells), self.classes.notes(cells)
+        )
+
+        final = pd.DataFrame(
+            {
+                "Date": self.dates[self.pair_keys[pairs] % len(self.dates)],
+                "Student Id": self.students[self.pair_keys[pairs] // len(self.dates)],
+                **{column: homeroom[column].to_numpy() for column in homeroom_columns},
+                "HR Summary": status_note(homeroom["Status"], homeroom["Note"]),
+                "Total Classes": self.counts[pairs, 0] + self.counts[pairs, 1],
+                classes_column: self.counts[pairs, classes_index],
+            }
+        )
+        wide_columns = [
+            f"{name}{i}" for i in range(1, width + 1) for name in ("Class", "StatusNote")
+        ]
+        return pd.concat(
+            [final, pd.DataFrame(wide, columns=wide_columns)], axis=1
+        )
+
+
+def find_discrepancies(homeroom_df, classes, absent_category_name="Absent"):
+    """
+    Days on which homeroom and class attendance disagree about a student
+    being absent, keyed by scenario name; classes is a ClassAttendance or
+    the raw class frame to build one from
+    """
+    if isinstance(classes, pd.DataFrame):
+        classes = ClassAttendance(classes)
+    counts = AttendanceCounts(homeroom_df, classes, absent_category_name)
+    return {
+        name: counts.mismatches(homeroom_column, classes_column)
+        for name, homeroom_column, classes_column in scenarios
+    }
+
+
+def quote_specific_columns(x):
+    return f'="{x}"'
+
+
+def write_csvs(finals, output_dir):
+    """
+    Write each of find_discrepancies' tables to output_dir as <name>.csv,
+    quoted so that spreadsheets keep the leading zeros of student ids
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for name, final in finals.items():
+        final.assign(**{"Student Id": final["Student Id"].apply(quote_specific_columns)}).to_csv(
+            os.path.join(output_dir, f"{name}.csv"),
+            index=False,
+            quoting=csv.QUOTE_NONNUMERIC,
+        )
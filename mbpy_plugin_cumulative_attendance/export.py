@@ -0,0 +1,81 @@
+import pathlib
+
+from .send_email import write_csv
+
+# Rows per parquet row group or Arrow record batch
+ROW_GROUP_ROWS = 100_000
+
+export_suffixes = {"parquet": ".parquet", "feather": ".feather", "csv": ".csv"}
+
+
+def exportable(df):
+    """
+    df with its index as leading columns, unless it has no name, and repeated
+    column labels numbered the way read_csv numbers them
+    """
+    labels, seen = [], {}
+    for label in map(str, df.columns):
+        count = seen.get(label, 0)
+        seen[label] = count + 1
+        labels.append(f"{label}.{count}" if count else label)
+    df = df.set_axis(labels, axis=1)
+    if all(name is None for name in df.index.names):
+        return df.reset_index(drop=True)
+    return df.reset_index()
+
+
+def arrow_batches(df, rows):
+    """
+    The Arrow schema of df and its tables of rows rows each, converted one at
+    a time so a long range never sits in memory twice
+    """
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    batches = (
+        pa.Table.from_pandas(df.iloc[start : start + rows], schema=schema, preserve_index=False)
+        for start in range(0, len(df), rows)
+    )
+    return schema, batches
+
+
+def write_parquet(df, path, rows=ROW_GROUP_ROWS):
+    import pyarrow.parquet as pq
+
+    schema, batches = arrow_batches(df, rows)
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            writer.write_table(batch, row_group_size=rows)
+
+
+def write_feather(df, path, rows=ROW_GROUP_ROWS):
+    """Feather version 2, which is the Arrow IPC file format"""
+    import pyarrow as pa
+
+    schema, batches = arrow_batches(df, rows)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in batches:
+            writer.write_table(batch, max_chunksize=rows)
+
+
+def write_csv_file(df, path, rows=ROW_GROUP_ROWS):
+    with open(path, "wb") as file:
+        write_csv(df, file, index=False)
+
+
+writers = {"parquet": write_parquet, "feather": write_feather, "csv": write_csv_file}
+
+
+def export_tables(tables, output_dir, output_format="parquet", prefix="", rows=ROW_GROUP_ROWS):
+    """
+    Write each of tables to output_dir as prefix + its name, in output_format,
+    and return the paths written
+    """
+    directory = pathlib.Path(output_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        path = directory / f"{prefix}{name}{export_suffixes[output_format]}"
+        writers[output_format](exportable(table), path, rows)
+        paths.append(path)
+    return paths
@@ -0,0 +1,79 @@
+import click
+
+# Raw frame column each fan-out mode splits the report on
+fan_out_columns = {"advisor": "Homeroom Advisor", "grade": "Grade", "program": "Program"}
+
+# SMTP connections shared by the group reports
+FAN_OUT_CONNECTIONS = 2
+
+
+def fan_out_options(fn):
+    fn = click.option(
+        "--fan-out",
+        "fan_out",
+        type=click.Choice(list(fan_out_columns)),
+        help="Send each homeroom advisor, grade or program a report of only their students",
+    )(fn)
+    fn = click.option(
+        "--fan-out-recipient",
+        "fan_out_recipients",
+        multiple=True,
+        metavar="GROUP=EMAIL",
+        help="Recipient of one group's report; advisors otherwise get theirs at their own email",
+    )(fn)
+    fn = click.option(
+        "--fan-out-workers",
+        "fan_out_workers",
+        type=click.IntRange(min=1),
+        help="Processes rendering the group reports, one per CPU by default",
+    )(fn)
+    fn = click.option(
+        "--max-per-minute",
+        "max_per_minute",
+        type=click.IntRange(min=1),
+        help="Most group reports sent per minute",
+    )(fn)
+    return fn
+
+
+def parse_recipients(values):
+    """
+    GROUP=EMAIL option values as a dict of group to email addresses
+    """
+    recipients = {}
+    for value in values:
+        group, _, email = value.rpartition("=")
+        if not group.strip() or not email.strip():
+            raise click.BadParameter(
+                f"expected GROUP=EMAIL, got {value!r}", param_hint="'--fan-out-recipient'"
+            )
+        recipients.setdefault(group.strip(), []).append(email.strip())
+    return recipients
+
+
+def split_groups(raw_df, by, *student_tables):
+    """
+    (group, raw rows, rows of each of student_tables) for each value of the
+    fan-out column, all cut from one groupby of raw_df and school wide tables
+    with a row per student
+    """
+    for group, rows in raw_df.groupby(fan_out_columns[by], observed=True).indices.items():
+        group_raw = raw_df.iloc[rows]
+        students = group_raw["Student Id"].unique()
+        yield (
+            group,
+            group_raw,
+            *(table.loc[table["Student Id"].isin(students)] for table in student_tables),
+        )
+
+
+def render_groups(render, tasks, workers=None):
+    """
+    render(*task) for every task in worker processes, yielding the results
+    in the order of tasks as soon as each one is ready
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(render, *task) for task in tasks]:
+            yield future.result()
@@ -1,26 +1,122 @@
 from mbpy.cli.formatted_click import click
 from mbpy.cli.formatted_click import RichClickGroup, RichClickCommand
-from .workweek import WorkWeek
-from mbpy.db.schema import YearGroup, Student, HRAttendanceByDate, Teacher
-from mbpy.cli.contexts import ImportContext, pass_settings_context
-from mbpy.cli.bulk import bulk_import_all
-from mbpy.cli.importers import import_homeroom_attendance_bydates
-import pandas as pd
-import numpy as np
-import sqlalchemy as sa
-from sqlalchemy import and_
-from .utils import multi_index_readable
-from .calculate import build_cumulative_status_is_active
-from .utils import smtp_shared_options, command_shared_options
-from .send_email import send_email
-from mbpy.exchanges.smtp_exchange import message_exchange, smtp_exchange
-import pathlib
-from sqlalchemy.orm import aliased
+from mbpy.cli.contexts import pass_settings_context
+from .utils import smtp_shared_options, command_shared_options, report_range, school_calendar
+from .profiling import NO_PROFILER, Profiler
+from .fan_out import (
+    FAN_OUT_CONNECTIONS,
+    fan_out_options,
+    parse_recipients,
+    render_groups,
+    split_groups,
+)
+from rich.console import Console
+import functools
+
+report_index = ["Student Id", "Student Name", "Grade", "Grade #", "Homeroom Advisor"]
+report_columns = ["Grade", "Grade #", "Homeroom Advisor"]
+
+
+def homeroom_tables(
+    raw_df, cumulative, attendance_rates, absent_category_name="Absent", profiler=NO_PROFILER
+):
+    """
+    The tables of a homeroom report, around the cumulative counts and
+    attendance rates worked out beforehand
+    """
+    from .reports import ReportBuilder
+
+    with profiler.phase("homeroom tally") as phase:
+        builder = ReportBuilder(
+            raw_df,
+            index=report_index,
+            columns=report_columns,
+            absent_category_name=absent_category_name,
+        )
+        phase.rows = len(raw_df)
+    tables = dict(cumulative=cumulative, attendance_rates=attendance_rates)
+    for name in ("not_present", "status_breakdown", "absent_days"):
+        with profiler.phase(f"homeroom {name}") as phase:
+            tables.update(builder.build([name]))
+            phase.rows = len(tables[name])
+    tables["not_present"] = tables["not_present"].reset_index().set_index("Student Id")
+    return tables
+
+
+def homeroom_message(
+    tables,
+    from_,
+    to_,
+    subject,
+    body,
+    template,
+    start_date,
+    end_date,
+    manual_statuses=(),
+    compression=None,
+    compress_above=5,
+    profiler=NO_PROFILER,
+):
+    from mbpy.exchanges.smtp_exchange import message_exchange
+    from .render import attach_report
+    from .send_email import csv_attachment
+
+    cumulative = tables["cumulative"]
+    cumulative = cumulative.assign(
+        **{status: 0 for status in manual_statuses if status not in cumulative.columns}
+    )
+
+    cumulative = cumulative.set_index("Student Id")
+    message = message_exchange(
+        from_,
+        to_,
+        subject,
+        body or "",
+        attachments=[
+            ("cumulative_absences", "df", cumulative),
+            ("not_present", "not_present", tables["not_present"]),
+        ],
+        template=None,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    if template:
+        with profiler.phase("homeroom render"):
+            attach_report(
+                message,
+                template,
+                cumulative,
+                subject=subject,
+                start_date=start_date,
+                end_date=end_date,
+            )
+    ## Tables the template does not use are streamed in as CSV parts of their own
+    with profiler.phase("homeroom attachments"):
+        for name in ("attendance_rates", "status_breakdown", "absent_days"):
+            message.attach(
+                csv_attachment(
+                    f"{name}.csv",
+                    tables[name],
+                    compression=compression,
+                    compress_above=compress_above * 1024 * 1024,
+                )
+            )
+    return message
+
+
+def group_message(
+    group, raw_df, cumulative, attendance, recipients, subject, absent_category_name, **options
+):
+    """The homeroom report of one fan-out group, for its recipients"""
+    tables = homeroom_tables(raw_df, cumulative, attendance, absent_category_name)
+    subject = f"{subject} - {group}" if subject else str(group)
+    return homeroom_message(tables, to_=recipients, subject=subject, **options)
 
 
 @click.command("cumulative-hr-attendance", cls=RichClickCommand)
 @command_shared_options
 @smtp_shared_options
+@fan_out_options
 @pass_settings_context
 @click.pass_context
 def cli(
@@ -29,6 +125,7 @@ def cli(
     scope,
     date,
     work_week,
+    holidays,
     import_,
     from_,
     to_,
@@ -40,181 +137,144 @@ def cli(
     tls,
     template,
     manual_statuses,
+    compression,
+    compress_above,
     absent_category_name,
+    absent_like,
+    top_absent,
+    cumulative_store,
+    cumulative_from,
+    start,
+    partition_workers,
+    create_indexes,
+    cache_dir,
+    cache_max_size,
+    cache_max_age,
+    fan_out,
+    fan_out_recipients,
+    fan_out_workers,
+    max_per_minute,
+    output_dir,
+    output_format,
+    profile,
+    profile_trace,
+    profile_cprofile,
     reports = True
 ):
     """Output for homeroom attendance"""
+    ## mbpy imports every plugin to list its commands, so pandas, the database
+    ## and the importers are only loaded once this command actually runs
+    from mbpy.cli.importers import import_homeroom_attendance_bydates
+    from mbpy.exchanges.smtp_exchange import smtp_exchange
+    from .attendance_records import (
+        get_homeroom_attendance_records,
+        get_homeroom_advisor_emails,
+    )
+    from .pipeline import report_tables
+    from .delivery import SMTPPool
+
+    profiler = Profiler.for_context(ctx, profile, profile_trace, profile_cprofile)
     end_date = date
-    ww = WorkWeek(work_week)
-    if scope in ["weekly", "monthly"]:
-        if scope == 'weekly':
-            start_date = ww.first_day_of_week(end_date)
-    elif scope == "daily":
-        start_date = end_date
-    else:
-        raise NotImplemented
-
-    if import_:
-        ctx.obj = ImportContext(incrementally=True, include_archived=True)
-        ctx.invoke(bulk_import_all)
-        ctx.invoke(
-            import_homeroom_attendance_bydates,
-            start_date=start_date,
-            end_date=end_date,
-            weekends=ww.weekends,
-        )
+    ww = school_calendar(work_week, holidays)
+    start_date, end_date = report_range(ww, scope, end_date, start)
 
-    date_df = pd.DataFrame(
-        pd.date_range(start=start_date, end=end_date), columns=["date"]
+    tables = report_tables(
+        ctx,
+        settings_obj,
+        "homeroom",
+        get_homeroom_attendance_records,
+        import_homeroom_attendance_bydates,
+        functools.partial(
+            homeroom_tables, absent_category_name=absent_category_name, profiler=profiler
+        ),
+        ww,
+        start_date,
+        end_date,
+        work_week=work_week,
+        import_=import_,
+        absent_category_name=absent_category_name,
+        absent_like=absent_like,
+        top_absent=top_absent,
+        cumulative_store=cumulative_store,
+        cumulative_from=cumulative_from,
+        partition_workers=partition_workers,
+        create_indexes=create_indexes,
+        cache_dir=cache_dir,
+        cache_max_size=cache_max_size,
+        cache_max_age=cache_max_age,
+        output_dir=output_dir,
+        output_format=output_format,
+        profiler=profiler,
+        reports=reports,
     )
+    raw_df = tables["raw"]
+    if raw_df.empty:
+        print('no records!')
+        return raw_df
 
-    rows = [
-        (dte.date(), dte.day_name(), not dte.dayofweek in ww.weekends)
-        for dte in date_df["date"]
-    ]
-
-    stmts = [
-        sa.select(
-            *[
-                sa.cast(sa.literal(d), sa.String).label("date"),
-                sa.cast(sa.literal(y), sa.String).label("day"),
-                sa.cast(sa.literal(b), sa.Boolean).label("bool"),
-            ]
-        )
-        if idx == 0
-        else sa.select(*[sa.literal(d), sa.literal(y), sa.literal(b)])
-        for idx, (d, y, b) in enumerate(rows)
-    ]
-    subquery_table = sa.union_all(*stmts)
-
-    subquery = subquery_table.cte(name="date_table")
-    day_records = []
-
-    with settings_obj.Session() as session:
-        ##
-        # Get attendance record for every date from within the range found
-        TeacherAlias = aliased(Teacher, flat=True)
-
-        attendance_records = (
-            session.query(YearGroup, Student, TeacherAlias, subquery, HRAttendanceByDate)
-            .join(Student, Student.year_group_id == YearGroup.id)
-            .join(TeacherAlias, Student.homeroom_advisor_id == TeacherAlias.id)
-            .join(subquery, subquery.c.bool == True)
-            .join(
-                HRAttendanceByDate,
-                and_(
-                    HRAttendanceByDate.student_id == Student.id,
-                    HRAttendanceByDate.year_group_id == YearGroup.id,
-                    HRAttendanceByDate.date == subquery.c.date,
-                    HRAttendanceByDate.status.is_not(None),
-                ),
-            )
-        )
-        #
-
-        for (
-            year_group,
-            student,
-            homeroom_teacher,
-            date,
-            day,
-            _,
-            hr_attendance,
-        ) in attendance_records.all():
-            day_record = {
-                "Student Id": student.student_id,
-                "Student Name": student.display_name,
-                "Year Group": year_group.name,
-                "Homeroom Advisor": homeroom_teacher.full_name,
-                "Grade": student.class_grade,
-                "Grade #": student.class_grade_number - 1,
-                "Program": year_group.program,
-                "Date": date,
-                "Day": day,
-                "Status": hr_attendance.status,
-                "Note": hr_attendance.note,
-            }
-            day_records.append(day_record)
-
-        raw_df = pd.DataFrame.from_records(day_records)
-        if raw_df.empty:
-            print('no records!')
-            return
+    if not reports: return raw_df
 
-        if not reports: return raw_df
-
-        cumulative = build_cumulative_status_is_active(raw_df, absent_column_name=absent_category_name)
-        for manual_status in manual_statuses:
-            if manual_status not in cumulative.columns:
-                cumulative[manual_status] = 0
-
-        status_counts = (
-            raw_df.rename(columns={"Student Id": "Count"})
-            .pivot_table(
-                index=["Status"],
-                columns=["Grade", "Grade #"],
-                values=["Count"],
-                aggfunc="count",
-                margins=True,
-                margins_name="Total",
-            )
-            .fillna(0)
-            .sort_values(by=["Status"], ascending=True)
-        )
-        status_counts = multi_index_readable(status_counts, sort_by=2)
-
-        status_breakdown = (
-            raw_df.rename(columns={"Student Id": "# students"})
-            .pivot_table(
-                index=["Date", "Status"],
-                columns=["Grade", "Grade #", "Homeroom Advisor"],
-                values=["# students"],
-                aggfunc="count",
-                margins=True,
-                margins_name="Total",
-            )
-            .fillna(0)
-        )
-        status_breakdown = multi_index_readable(status_breakdown, sort_by=2)
+    message_options = dict(
+        from_=from_,
+        body=body,
+        template=template,
+        start_date=start_date,
+        end_date=end_date,
+        manual_statuses=manual_statuses,
+        compression=compression,
+        compress_above=compress_above,
+    )
 
-        absent_days = raw_df.loc[raw_df["Status"] == "Absent"].pivot(
-            index=["Student Id", "Student Name", "Grade", "Grade #", "Homeroom Advisor"],
-            columns=["Date"],
-            values=["Note"],
-        )
-        absent_days = (
-            absent_days.replace({col: np.nan for col in absent_days.columns}, "-")
-            .replace({col: "" for col in absent_days.columns}, '"Absent"')
-            .sort_values(by=["Grade #", "Student Name"])
-        )
-        absent_days = multi_index_readable(absent_days, has_margins=False)
+    if fan_out:
+        recipients = parse_recipients(fan_out_recipients)
+        if fan_out == "advisor":
+            with settings_obj.Session() as session:
+                advisor_emails = get_homeroom_advisor_emails(session)
+            for advisor, email in advisor_emails.items():
+                recipients.setdefault(advisor, [email])
 
-        raw_df["Summary"] = raw_df["Status"] + ' "' + raw_df["Note"] + '"'
-        student_non_present_summary = raw_df.loc[raw_df["Status"] != "Present"].pivot(
-            index=["Student Id", "Student Name", "Grade", "Grade #", "Homeroom Advisor"],
-            columns=["Date"],
-            values=["Summary"],
-        )
-        student_non_present_summary = student_non_present_summary.replace(
-            {col: np.nan for col in student_non_present_summary.columns}, "Present"
-        ).sort_values(by=["Grade #", "Student Name"])
-        student_non_present_summary = multi_index_readable(
-            student_non_present_summary.reset_index().set_index('Student Id'), has_margins=False
-        )
+        console = Console(stderr=True)
+        tasks = []
+        for group, *group_tables in split_groups(
+            raw_df, fan_out, tables["cumulative"], tables["attendance_rates"]
+        ):
+            if group not in recipients:
+                console.print(f"[yellow]No recipient for {group}, skipping its report[/yellow]")
+                continue
+            tasks.append((group, *group_tables, recipients[group]))
 
-        message = message_exchange(
-            from_,
-            to_,
-            subject,
-            body or "",
-            attachments=[
-                ("cumulative_absences", "df", cumulative.set_index("Student Id")),
-                ("not_present", "not_present", student_non_present_summary),
-                ("status_breakdown", None, status_breakdown),
-                ("absent_days", None, absent_days)
-            ],
-            template=pathlib.Path(template) if template else None,
-            start_date=start_date,
-            end_date=end_date,
+        render = functools.partial(
+            group_message,
+            subject=subject,
+            absent_category_name=absent_category_name,
+            **message_options,
         )
+        with profiler.phase("homeroom fan-out") as phase, SMTPPool(
+            host,
+            port,
+            from_,
+            password,
+            tls=tls,
+            size=FAN_OUT_CONNECTIONS,
+            max_per_minute=max_per_minute,
+        ) as pool:
+            errors = pool.send_all(
+                (message, from_, to)
+                for message, (*_, to) in zip(
+                    render_groups(render, tasks, fan_out_workers), tasks
+                )
+            )
+            phase.rows = len(tasks)
+        for (group, *_), error in zip(tasks, errors):
+            if error is not None:
+                console.print(f"[red]Report for {group} was not sent: {error}[/red]")
+
+        ## The school wide report still goes to --to, if anyone
+        if not to_:
+            return
+
+    message = homeroom_message(
+        tables, to_=to_, subject=subject, profiler=profiler, **message_options
+    )
+    with profiler.phase("homeroom send"):
         smtp_exchange(message, tls, host, port, from_, password)
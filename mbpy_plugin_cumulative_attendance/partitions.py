@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .calculate import most_absent
+
+
+def fetch_partitioned(settings_obj, get_records, ww, start_date, end_date, workers=1):
+    """
+    Fetch the range one week at a time, each week in its own session, and
+    return the frames in date order; a range without school days is fetched
+    whole, so there is still one, empty, frame to build on
+    """
+
+    def fetch(partition):
+        with settings_obj.Session() as session:
+            return get_records(session, *partition, ww)
+
+    partitions = list(ww.partitions(start_date, end_date)) or [(start_date, end_date)]
+    if workers == 1 or len(partitions) == 1:
+        return [fetch(partition) for partition in partitions]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fetch, partitions))
+
+
+def combine_cumulative(parts, absent_column_name="Absent", unique=None, absent_like=(), top_n=None):
+    """
+    Add up the per partition results of build_cumulative_status_is_active,
+    which should not have been cut down to their top_n themselves
+    """
+    if unique is None:
+        unique = ["Student Id", "Student Name", "Grade", "Grade #"]
+
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        return pd.DataFrame()
+    if len(parts) == 1:
+        combined = parts[0].copy()
+    else:
+        combined = (
+            pd.concat(parts, ignore_index=True)
+            .groupby(unique, observed=True)
+            .sum()
+            .astype(int)
+            .reset_index()
+        )
+        combined.columns.name = "Status"
+    ## A range without a single absence has no absent column to rank by
+    if absent_column_name not in combined.columns:
+        combined[absent_column_name] = 0
+    return most_absent(combined, [absent_column_name, *absent_like], top_n)
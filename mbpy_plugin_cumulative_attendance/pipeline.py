@@ -0,0 +1,255 @@
+import datetime
+
+from .profiling import NO_PROFILER
+
+# Tables of a report that are exported next to its raw records
+exported_tables = (
+    "cumulative",
+    "attendance_rates",
+    "not_present",
+    "status_breakdown",
+    "absent_days",
+)
+
+
+def import_range(
+    ctx, report, import_records, ww, start_date, end_date, cache, import_key, cache_max_age, profiler
+):
+    """
+    Bulk import, then import_records over the range, unless the cache saw
+    that import less than cache_max_age seconds ago
+    """
+    from mbpy.cli.contexts import ImportContext
+    from mbpy.cli.bulk import bulk_import_all
+
+    if cache and cache.imported_within(import_key, cache_max_age):
+        return
+    with profiler.phase(f"{report} bulk import"):
+        ctx.obj = ImportContext(incrementally=True, include_archived=True)
+        ctx.invoke(bulk_import_all)
+    with profiler.phase(f"{report} by-date import"):
+        ctx.invoke(
+            import_records,
+            start_date=start_date,
+            end_date=end_date,
+            weekends=ww.weekends,
+        )
+    if cache:
+        cache.record_import(import_key)
+
+
+def partition_counts(partitions, absent_category_name="Absent"):
+    """
+    Status counts of each student in each partition, small enough to keep
+    once the partitions themselves are let go
+    """
+    from .calculate import build_cumulative_status_is_active
+
+    return [
+        build_cumulative_status_is_active(partition, absent_column_name=absent_category_name)
+        for partition in partitions
+    ]
+
+
+def cumulative_counts(
+    report,
+    raw_df,
+    counts,
+    start_date,
+    end_date,
+    absent_category_name="Absent",
+    absent_like=(),
+    top_absent=None,
+    cumulative_store=None,
+    cumulative_from=None,
+):
+    """
+    Status counts of each student, from the cumulative store when there is
+    one and otherwise added up over the partition_counts of the fetch
+    """
+    from .cumulative_store import CumulativeStore
+    from .partitions import combine_cumulative
+
+    if cumulative_store:
+        store = CumulativeStore(cumulative_store)
+        store.update(report, raw_df, start_date, end_date)
+        return store.cumulative(
+            report,
+            cumulative_from or start_date,
+            end_date,
+            absent_column_name=absent_category_name,
+            absent_like=absent_like,
+            top_n=top_absent,
+        )
+    return combine_cumulative(
+        counts,
+        absent_column_name=absent_category_name,
+        absent_like=absent_like,
+        top_n=top_absent,
+    )
+
+
+def earlier_records(settings_obj, get_records, ww, start_date, count, workers=1):
+    """
+    The count school days right before start_date, and the records on them,
+    for the rolling windows of the attendance rates to reach back into
+    """
+    from .attendance_records import concat_records
+    from .partitions import fetch_partitioned
+
+    days = ww.school_days_before(start_date, count)
+    if not len(days):
+        return days, None
+    first = datetime.datetime.combine(days[0].item(), datetime.time())
+    partitions = fetch_partitioned(
+        settings_obj, get_records, ww, first, start_date - datetime.timedelta(days=1), workers
+    )
+    return days, concat_records(partitions)
+
+
+def report_tables(
+    ctx,
+    settings_obj,
+    report,
+    get_records,
+    import_records,
+    build_tables,
+    ww,
+    start_date,
+    end_date,
+    *,
+    work_week,
+    import_,
+    absent_category_name,
+    absent_like,
+    top_absent,
+    cumulative_store,
+    cumulative_from,
+    partition_workers,
+    create_indexes,
+    cache_dir,
+    cache_max_size,
+    cache_max_age,
+    output_dir,
+    output_format,
+    profiler=NO_PROFILER,
+    reports=True,
+):
+    """
+    The tables of the homeroom or class report, report being "homeroom" or
+    "class", from the cache or else built by build_tables(raw_df,
+    cumulative, rates) on the records get_records fetches a week at a time.
+    The raw records are under "raw"; without reports, or when there are
+    none, they are all there is.
+    """
+    from .attendance_records import concat_records, create_attendance_indexes
+    from .partitions import fetch_partitioned
+    from .analytics import ROLLING_WINDOWS, attendance_rates
+    from .report_cache import ReportCache
+    from .export import export_tables
+
+    cache = ReportCache(cache_dir, cache_max_size * 1024 * 1024) if cache_dir else None
+    import_key = ReportCache.import_key(report, start_date, end_date, work_week)
+    if import_:
+        import_range(
+            ctx,
+            report,
+            import_records,
+            ww,
+            start_date,
+            end_date,
+            cache,
+            import_key,
+            cache_max_age,
+            profiler,
+        )
+
+    cache_key = (
+        cache.key(
+            import_key,
+            ww.holidays.tolist(),
+            absent_category_name,
+            absent_like,
+            top_absent,
+            cumulative_store,
+            cumulative_from,
+        )
+        if cache
+        else None
+    )
+    tables = cache.get(cache_key) if cache else {}
+
+    counts = None
+    if "raw" not in tables:
+        if create_indexes:
+            with profiler.phase(f"{report} indexes"), settings_obj.Session() as session:
+                create_attendance_indexes(session)
+        with profiler.phase(f"{report} query") as phase:
+            partitions = fetch_partitioned(
+                settings_obj, get_records, ww, start_date, end_date, workers=partition_workers
+            )
+            ## Count each week while it is at hand, and let the weeks go once
+            ## stacked, so only one copy of the records outlives this phase
+            if reports and not cumulative_store:
+                counts = partition_counts(partitions, absent_category_name)
+            tables["raw"] = concat_records(partitions)
+            del partitions
+            phase.rows = len(tables["raw"])
+        if cache and not reports:
+            cache.put(cache_key, tables)
+    raw_df = tables["raw"]
+    if raw_df.empty or not reports:
+        return tables
+
+    if "attendance_rates" not in tables:
+        with profiler.phase(f"{report} cumulative") as phase:
+            if counts is None and not cumulative_store:
+                counts = partition_counts([raw_df], absent_category_name)
+            cumulative = cumulative_counts(
+                report,
+                raw_df,
+                counts,
+                start_date,
+                end_date,
+                absent_category_name=absent_category_name,
+                absent_like=absent_like,
+                top_absent=top_absent,
+                cumulative_store=cumulative_store,
+                cumulative_from=cumulative_from,
+            )
+            phase.rows = len(cumulative)
+
+        with profiler.phase(f"{report} window query") as phase:
+            earlier_days, earlier_df = earlier_records(
+                settings_obj,
+                get_records,
+                ww,
+                start_date,
+                max(ROLLING_WINDOWS),
+                workers=partition_workers,
+            )
+            phase.rows = 0 if earlier_df is None else len(earlier_df)
+
+        with profiler.phase(f"{report} attendance rates") as phase:
+            rates = attendance_rates(
+                raw_df,
+                ww.school_days(start_date, end_date),
+                absent_statuses=[absent_category_name, *absent_like],
+                earlier_df=earlier_df,
+                earlier_days=earlier_days,
+            )
+            phase.rows = len(rates)
+
+        tables.update(build_tables(raw_df, cumulative, rates))
+        if cache:
+            cache.put(cache_key, tables)
+
+    if output_dir:
+        with profiler.phase(f"{report} export"):
+            export_tables(
+                {"raw_data": raw_df, **{name: tables[name] for name in exported_tables}},
+                output_dir,
+                output_format,
+                prefix=f"{report}_",
+            )
+    return tables
@@ -0,0 +1,147 @@
+from contextlib import contextmanager
+import datetime
+import json
+import threading
+import time
+import tracemalloc
+
+from rich.console import Console
+from rich.table import Table
+
+# Key of the run's profiler in click's ctx.meta, shared with commands invoked from it
+META_KEY = "mbpy_plugin_cumulative_attendance.profiler"
+
+
+class Phase:
+    """Wall time, rows and peak traced memory of one phase of a run"""
+
+    def __init__(self, name):
+        self.name = name
+        self.thread = threading.current_thread().name
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.rows = None
+        self.peak = 0
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "thread": self.thread,
+            "seconds": self.seconds,
+            "rows": self.rows,
+            "peak_bytes": self.peak,
+        }
+
+
+class Profiler:
+    """
+    Phases of a report run, summarized in a table on stderr once the run is
+    over and optionally written to a JSON trace; with cprofile_path set the
+    whole run is also profiled with cProfile.
+
+    A disabled profiler still hands out phases, but records nothing.
+    """
+
+    def __init__(self, enabled=False, trace_path=None, cprofile_path=None):
+        self.enabled = enabled or bool(trace_path or cprofile_path)
+        self.trace_path = trace_path
+        self.cprofile_path = cprofile_path
+        self.phases = []
+        self._open = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._cprofile = None
+
+        if self.enabled:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if cprofile_path:
+                import cProfile
+
+                self._cprofile = cProfile.Profile()
+                self._cprofile.enable()
+
+    @classmethod
+    def for_context(cls, ctx, profile=False, trace_path=None, cprofile_path=None):
+        """
+        The profiler of the run ctx belongs to, started here if this command is
+        the first to ask, in which case it reports when ctx closes
+        """
+        profiler = ctx.meta.get(META_KEY)
+        if profiler is None:
+            profiler = ctx.meta[META_KEY] = cls(profile, trace_path, cprofile_path)
+            ctx.call_on_close(profiler.finish)
+        return profiler
+
+    def _update_peaks(self):
+        """Fold the peak since the last reset into every open phase"""
+        peak = tracemalloc.get_traced_memory()[1]
+        for phase in self._open:
+            phase.peak = max(phase.peak, peak)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed block; set .rows on the phase to record how many rows it handled
+        """
+        phase = Phase(name)
+        if not self.enabled:
+            yield phase
+            return
+
+        with self._lock:
+            self._update_peaks()
+            tracemalloc.reset_peak()
+            self._open.append(phase)
+            self.phases.append(phase)
+        try:
+            yield phase
+        finally:
+            with self._lock:
+                self._update_peaks()
+                self._open.remove(phase)
+            phase.seconds = time.perf_counter() - phase.started
+
+    def finish(self):
+        if not self.enabled:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+
+        total = time.perf_counter() - self._started
+        table = Table(title="Profile")
+        table.add_column("Phase")
+        table.add_column("Thread")
+        table.add_column("Seconds", justify="right")
+        table.add_column("Rows", justify="right")
+        table.add_column("Peak MB", justify="right")
+        for phase in self.phases:
+            table.add_row(
+                phase.name,
+                phase.thread,
+                f"{phase.seconds:.3f}" if phase.seconds is not None else "-",
+                f"{phase.rows:,}" if phase.rows is not None else "",
+                f"{phase.peak / 1024 / 1024:.1f}",
+            )
+        with self._lock:
+            self._update_peaks()
+            peak = max([phase.peak for phase in self.phases], default=0)
+        table.add_row("total", "", f"{total:.3f}", "", f"{peak / 1024 / 1024:.1f}")
+        Console(stderr=True).print(table)
+
+        if self.trace_path:
+            with open(self.trace_path, "w") as file:
+                json.dump(
+                    {
+                        "finished": datetime.datetime.now().isoformat(),
+                        "total_seconds": total,
+                        "phases": [phase.as_dict() for phase in self.phases],
+                    },
+                    file,
+                    indent=2,
+                )
+
+
+# Stands in where no run profiler is passed
+NO_PROFILER = Profiler()
@@ -0,0 +1,84 @@
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import datetime
+import functools
+import os
+import pathlib
+import types
+
+import jinja2
+
+# Macros templates can import, such as report_table from tables.html
+PACKAGE_TEMPLATES = pathlib.Path(__file__).parent / "templates"
+
+# Compiled templates are kept here between runs
+BYTECODE_CACHE = (
+    pathlib.Path(os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache"))
+    / "mbpy_plugin_cumulative_attendance"
+    / "jinja"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def template_environment(directory):
+    """
+    One environment per template directory, loading from there and then the
+    package templates, with compiled templates cached on disk
+    """
+    BYTECODE_CACHE.mkdir(parents=True, exist_ok=True)
+    return jinja2.Environment(
+        loader=jinja2.ChoiceLoader(
+            [
+                jinja2.FileSystemLoader(str(directory)),
+                jinja2.FileSystemLoader(str(PACKAGE_TEMPLATES)),
+            ]
+        ),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(str(BYTECODE_CACHE)),
+        autoescape=jinja2.select_autoescape(["html", "htm"]),
+    )
+
+
+def report_table(df):
+    """
+    df as the header and the (label, values) row tuples the report_table macro
+    iterates, converted to plain Python values once
+    """
+    return types.SimpleNamespace(
+        index_name=df.index.name,
+        columns=[str(column) for column in df.columns],
+        rows=list(zip(df.index.tolist(), df.itertuples(index=False, name=None))),
+    )
+
+
+def render_report(template, df, **data):
+    """
+    Render the template file with df, its table and data available as data.*
+    """
+    template = pathlib.Path(template).resolve()
+    environment = template_environment(template.parent)
+    now = datetime.datetime.now()
+    return environment.get_template(template.name).render(
+        data=types.SimpleNamespace(
+            today=now.date(), now=now, df=df, table=report_table(df), **data
+        )
+    )
+
+
+def attach_report(message, template, df, **data):
+    """
+    Make the rendered template the body of message, ahead of its attachments,
+    as a multipart/alternative with the plain text body when it has one;
+    attached after them, mail clients list the HTML as one more attachment
+    """
+    body = MIMEMultipart("alternative")
+    parts = message.get_payload()
+    plain = [
+        part
+        for part in parts
+        if part.get_content_type() == "text/plain" and part.get_content_disposition() is None
+    ][:1]
+    for part in plain:
+        body.attach(part)
+    body.attach(MIMEText(render_report(template, df, **data), "html"))
+    message.set_payload([body, *(part for part in parts if part not in plain)])
+    return message
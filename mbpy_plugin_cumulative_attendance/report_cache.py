@@ -0,0 +1,160 @@
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  ## Windows: threads of one process are still serialized
+    fcntl = None
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Serializes index updates between threads; flock on the lock file does so between processes
+index_lock = threading.Lock()
+
+
+class ReportCache:
+    """
+    Raw frames and derived tables of earlier runs, one parquet file per table,
+    evicted least recently used first once the directory grows past max_bytes.
+
+    Entries are only read and written for ranges whose import this cache has
+    seen, since that import time is what tells an entry is still fresh.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.json"
+        self.lock_path = self.directory / "index.lock"
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def import_key(report, start_date, end_date, work_week):
+        return f"{report}:{start_date.date()}:{end_date.date()}:{work_week}"
+
+    def key(self, import_key, *parts):
+        """Cache key of the tables built from the latest import of import_key"""
+        watermark = self.watermark(import_key)
+        if watermark is None:
+            return None
+        parts = json.dumps([import_key, watermark, *parts], default=str)
+        return hashlib.sha1(parts.encode()).hexdigest()
+
+    def watermark(self, import_key):
+        return self._read_index()["imports"].get(import_key)
+
+    def record_import(self, import_key):
+        with self._updating() as index:
+            index["imports"][import_key] = datetime.datetime.now().isoformat()
+
+    def imported_within(self, import_key, seconds):
+        watermark = self.watermark(import_key)
+        if not seconds or watermark is None:
+            return False
+        age = datetime.datetime.now() - datetime.datetime.fromisoformat(watermark)
+        return age.total_seconds() < seconds
+
+    def get(self, key):
+        """The tables stored under key, by name, or an empty dict"""
+        if key is None:
+            return {}
+        entry = self._read_index()["entries"].get(key)
+        if entry is None:
+            return {}
+
+        tables = {}
+        try:
+            for name, layout in entry["tables"].items():
+                table = pd.read_parquet(self.directory / key / f"{name}.parquet")
+                table.columns = pd.Index(layout["columns"], name=layout["columns_name"])
+                tables[name] = table
+        except (OSError, ImportError, ValueError):
+            return {}
+
+        with self._updating() as index:
+            if key in index["entries"]:
+                index["entries"][key]["used"] = time.time()
+        return tables
+
+    def put(self, key, tables):
+        """Store the tables under key, skipping any that parquet cannot hold"""
+        if key is None:
+            return
+        path = self.directory / key
+        path.mkdir(exist_ok=True)
+
+        layouts = {}
+        for name, table in tables.items():
+            layout = {
+                "columns": [str(column) for column in table.columns],
+                "columns_name": table.columns.name,
+            }
+            ## Positional names, since derived tables can repeat a column label
+            stored = table.set_axis([str(i) for i in range(table.shape[1])], axis=1)
+            try:
+                stored.to_parquet(path / f"{name}.parquet")
+            except (ImportError, ValueError, TypeError, NotImplementedError):
+                continue
+            layouts[name] = layout
+
+        with self._updating() as index:
+            index["entries"][key] = {
+                "tables": layouts,
+                "size": sum(file.stat().st_size for file in path.iterdir()),
+                "used": time.time(),
+            }
+            self._evict(index)
+
+    def _evict(self, index):
+        entries = index["entries"]
+        total = sum(entry["size"] for entry in entries.values())
+        for key in sorted(entries, key=lambda key: entries[key]["used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries.pop(key)["size"]
+            shutil.rmtree(self.directory / key, ignore_errors=True)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"imports": {}, "entries": {}}
+
+    @contextlib.contextmanager
+    def _updating(self):
+        """
+        The index, written back on exit, with every other update of it from
+        this or another process held off until then
+        """
+        with index_lock, open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                yield index
+                self._write_index(index)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_index(self, index):
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.directory, prefix="index.", suffix=".tmp", delete=False
+        ) as file:
+            json.dump(index, file)
+        try:
+            os.replace(file.name, self.index_path)
+        except OSError:
+            os.unlink(file.name)
+            raise
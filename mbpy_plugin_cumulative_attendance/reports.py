@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+from .utils import multi_index_readable
+
+report_tables = ("status_counts", "status_breakdown", "absent_days", "not_present")
+
+
+def date_labels(dates):
+    """
+    Dates as the ISO strings that head report rows and columns
+    """
+    return np.asarray(pd.to_datetime(dates).strftime("%Y-%m-%d"), dtype=object)
+
+
+class ReportBuilder:
+    """
+    The report tables of one raw attendance frame.
+
+    Dates, statuses and column groups (grade, plus whatever else columns
+    adds) are coded once, and a single bincount over those codes gives the
+    counts both status_counts and status_breakdown are read from.
+    """
+
+    def __init__(self, raw_df, index, columns, absent_category_name="Absent"):
+        self.raw_df = raw_df
+        self.index = index
+        self.columns = columns
+        self.absent_category_name = absent_category_name
+
+        date_codes, dates = pd.factorize(raw_df["Date"], sort=True)
+        status_codes, statuses = pd.factorize(raw_df["Status"], sort=True)
+        self.dates = date_labels(dates)
+        self.statuses = np.asarray(statuses, dtype=object)
+        groups = raw_df.groupby(columns, observed=True, sort=True)
+        group_codes = groups.ngroup().to_numpy()
+        self.groups = groups.size().index
+
+        shape = (len(self.dates), len(self.statuses), len(self.groups))
+        ## Rows without a status or group are not counted, as pivot_table leaves them out
+        counted = (status_codes >= 0) & (group_codes >= 0)
+        flat = (date_codes * shape[1] + status_codes) * shape[2] + group_codes
+        self.counts = np.bincount(flat[counted], minlength=int(np.prod(shape))).reshape(shape)
+
+    def build(self, tables=report_tables):
+        """The requested tables by name, skipping the work for any others"""
+        return {name: getattr(self, name)() for name in tables}
+
+    def _group_columns(self, value_name, groups):
+        groups = [group if isinstance(group, tuple) else (group,) for group in groups]
+        margin = ("Total",) + ("",) * (len(groups[0]) - 1 if groups else 0)
+        return pd.MultiIndex.from_tuples(
+            [(value_name, *group) for group in groups] + [(value_name, *margin)]
+        )
+
+    @staticmethod
+    def _with_margins(counts, index, columns, margin_row):
+        """Counts with a Total column of row sums and a Total row of column sums"""
+        counts = np.column_stack([counts, counts.sum(axis=1)])
+        counts = np.vstack([counts, counts.sum(axis=0)])
+        index = index.append(margin_row).set_names(index.names)
+        return pd.DataFrame(counts, index=index, columns=columns)
+
+    def status_counts(self):
+        by_status = pd.DataFrame(self.counts.sum(axis=0).T, index=self.groups)
+        by_grade = by_status.groupby(level=["Grade", "Grade #"], observed=True, sort=True).sum()
+        table = self._with_margins(
+            by_grade.to_numpy().T,
+            pd.Index(self.statuses, name="Status"),
+            self._group_columns("Count", by_grade.index),
+            pd.Index(["Total"]),
+        ).sort_values(by=["Status"], ascending=True)
+        return multi_index_readable(table, sort_by=2)
+
+    def status_breakdown(self):
+        by_day = self.counts.reshape(-1, len(self.groups))
+        observed = by_day.any(axis=1)
+        index = pd.MultiIndex.from_product(
+            [self.dates, self.statuses], names=["Date", "Status"]
+        )[observed]
+        table = self._with_margins(
+            by_day[observed],
+            index,
+            self._group_columns("# students", self.groups),
+            pd.MultiIndex.from_tuples([("Total", "")]),
+        )
+        return multi_index_readable(table, sort_by=2)
+
+    def absent_days(self):
+        raw_df = self.raw_df
+        return by_student(
+            wide_table(
+                raw_df.loc[raw_df["Status"] == self.absent_category_name],
+                self.index,
+                "Note",
+                missing="-",
+                empty='"Absent"',
+            )
+        )
+
+    def not_present(self):
+        raw_df = self.raw_df
+        non_present = raw_df.loc[raw_df["Status"] != "Present"]
+        non_present = non_present.assign(
+            Summary=non_present["Status"].astype(str) + ' "' + non_present["Note"] + '"'
+        )
+        return by_student(wide_table(non_present, self.index, "Summary", missing="Present"))
+
+
+def by_student(table):
+    """A wide table ordered by grade and student name, with its date columns flattened"""
+    return multi_index_readable(
+        table.sort_values(by=["Grade #", "Student Name"]), has_margins=False
+    )
+
+
+def wide_table(df, index, values, missing, empty=None):
+    """
+    One row per index key and one column per date, laid out like
+    df.pivot(index=index, columns=["Date"], values=[values]), which keeps
+    null keys as keys of their own.
+    """
+    rows = df.groupby(index, observed=True, sort=True, dropna=False)
+    date_codes, dates = pd.factorize(df["Date"], sort=True)
+    return scatter_table(
+        rows.ngroup().to_numpy(),
+        rows.size().index,
+        date_codes,
+        dates,
+        df[values].to_numpy(dtype=object, copy=True),
+        values,
+        missing,
+        empty,
+    )
+
+
+def scatter_table(row_codes, row_index, date_codes, dates, cell_values, values, missing, empty=None):
+    """
+    The wide table of cell_values, each placed at its row and date code.
+
+    Cells start out as missing, and the values are masked for nulls (and,
+    given empty, for empty strings) before being scattered into place, rather
+    than running DataFrame.replace over every column of the pivot.
+    """
+    cell_values[pd.isna(cell_values)] = missing
+    if empty is not None:
+        cell_values[cell_values == ""] = empty
+
+    ## fill rather than np.full, which is far slower for object arrays
+    cells = np.empty((len(row_index), len(dates)), dtype=object)
+    cells.fill(missing)
+    cells[row_codes, date_codes] = cell_values
+
+    columns = pd.MultiIndex.from_arrays(
+        [[values] * len(dates), date_labels(dates)], names=[None, "Date"]
+    )
+    return pd.DataFrame(cells, index=row_index, columns=columns, copy=False)
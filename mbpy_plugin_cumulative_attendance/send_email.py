@@ -1,20 +1,113 @@
-from email.mime.application import MIMEApplication
+from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from rich.console import Console
-import smtplib
+from tempfile import SpooledTemporaryFile
 import pandas as pd
+from .delivery import SMTPPool
 
-import io, ssl
+import base64, gzip, shutil, zipfile
 
+# Bytes of an attachment kept in memory before it spills over to a temporary file
+SPOOL_SIZE = 8 * 1024 * 1024
 
-def export_csv(df):
-    with io.StringIO() as buffer:
-        df.to_csv(buffer, index=False)
-        return buffer.getvalue()
+# Rows handed to the CSV writer at a time
+CSV_CHUNK_ROWS = 10_000
 
+# Attachments larger than this are gzipped unless a compression is chosen
+COMPRESS_ABOVE = 5 * 1024 * 1024
 
-def send_email(from_, send_to, subject, body, password, *dataframes):
+# Read size when base64 encoding, a multiple of the 57 bytes in each encoded line
+ENCODE_BLOCK = 57 * 1024
+
+mime_types = {
+    ".csv": ("text", "csv"),
+    ".gz": ("application", "gzip"),
+    ".zip": ("application", "zip"),
+}
+
+
+class Utf8Writer:
+    """
+    Text writes encoded into a binary file as they come; TextIOWrapper only
+    takes a SpooledTemporaryFile from Python 3.11 on
+    """
+
+    def __init__(self, binary):
+        self.binary = binary
+
+    def write(self, text):
+        return self.binary.write(text.encode("utf-8"))
+
+
+def write_csv(df, binary, **to_csv):
+    """
+    Write df as UTF-8 CSV into binary, CSV_CHUNK_ROWS rows at a time
+    """
+    df.to_csv(Utf8Writer(binary), chunksize=CSV_CHUNK_ROWS, **to_csv)
+
+
+def compress(source, filename, compression):
+    """
+    A new spooled buffer holding source compressed, and the file name to go with it
+    """
+    target = SpooledTemporaryFile(SPOOL_SIZE)
+    source.seek(0)
+    if compression == "zip":
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as archive:
+            with archive.open(filename, "w", force_zip64=True) as member:
+                shutil.copyfileobj(source, member)
+        return target, f"{filename}.zip"
+    with gzip.GzipFile(filename=filename, mode="wb", fileobj=target) as member:
+        shutil.copyfileobj(source, member)
+    return target, f"{filename}.gz"
+
+
+def encoded_part(buffer, filename):
+    """
+    A base64 MIME part of everything in buffer, encoded a block at a time.
+    The email package takes the payload as one string, so the part holds the
+    whole encoded attachment, and serializing the message copies it again.
+    """
+    maintype, subtype = mime_types.get(
+        filename[filename.rfind(".") :], ("application", "octet-stream")
+    )
+    part = MIMEBase(maintype, subtype, name=filename)
+    buffer.seek(0)
+    part.set_payload(
+        "".join(
+            base64.encodebytes(block).decode("ascii")
+            for block in iter(lambda: buffer.read(ENCODE_BLOCK), b"")
+        )
+    )
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=filename)
+    return part
+
+
+def csv_attachment(filename, df, compression=None, compress_above=COMPRESS_ABOVE, **to_csv):
+    """
+    MIME attachment of df as CSV, written and compressed through a spooled
+    buffer rather than built as one string; only the encoded part is held in
+    memory (see encoded_part), which compression keeps small. compression is
+    "gzip" or "zip"; without one, CSVs larger than compress_above bytes are
+    gzipped anyway.
+    """
+    with SpooledTemporaryFile(SPOOL_SIZE) as buffer:
+        write_csv(df, buffer, **to_csv)
+        if compression is None and compress_above is not None and buffer.tell() > compress_above:
+            compression = "gzip"
+        if not compression:
+            return encoded_part(buffer, filename)
+        compressed, filename = compress(buffer, filename, compression)
+
+    with compressed:
+        return encoded_part(compressed, filename)
+
+
+def send_email(
+    from_, send_to, subject, body, password, *dataframes, host="smtp.gmail.com", port=465
+):
     if not len(send_to):
         console = Console()
         for name, df in dataframes:
@@ -29,15 +122,10 @@ def send_email(from_, send_to, subject, body, password, *dataframes):
     multipart["Subject"] = subject
 
     for filename, df in dataframes:
-        attachment = MIMEApplication(export_csv(df), Name=filename)
-        attachment["Content-Disposition"] = f'attachment; filename="{filename}"'
-        multipart.attach(attachment)
+        multipart.attach(csv_attachment(filename, df, index=False))
 
     multipart.add_header("Content-Type", "text/plain")
     multipart.attach(MIMEText(body, "plain"))
 
-    context = ssl.create_default_context()
-    data = multipart.as_bytes()
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as email:
-        email.login(from_, password)
-        email.sendmail(from_, send_to, data)
+    with SMTPPool(host, port, from_, password) as pool:
+        pool.send(multipart, from_, list(send_to))
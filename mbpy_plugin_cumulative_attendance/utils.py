@@ -5,27 +5,58 @@ def multi_index_readable(df, sort_by=1, show_index=1, has_margins=True):
     """
     Sort multi index dataframe, and collapse to one row
     """
-    cols = df.columns
+    cols = [c for c in df.columns]
     if has_margins:
-        cols, margin = cols[:-1], cols[-1:]
-    else:
-        cols = [c for c in cols]
+        cols = cols[:-1]
+    order = sorted(range(len(cols)), key=lambda i: cols[i][sort_by])
     new_cols = [
-        "/".join([c[i] for i in show_index])
+        "/".join([cols[i][j] for j in show_index])
         if isinstance(show_index, tuple)
-        else c[show_index]
-        for c in sorted(cols, key=lambda i: i[sort_by])
+        else cols[i][show_index]
+        for i in order
     ] + (["Total"] if has_margins else [])
+    df = df.iloc[:, order + ([len(cols)] if has_margins else [])]
     df.columns = new_cols
     return df
 
 
+def report_range(ww, scope, date, start=None):
+    """
+    Start and end dates of the report for the chosen scope
+    """
+    try:
+        return ww.start_of_scope(scope, date, start), date
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="'--start'")
+
+
+def school_calendar(work_week, holidays=None):
+    """
+    The WorkWeek of the --work-week and --holidays options
+    """
+    from .workweek import WorkWeek, read_holidays
+
+    try:
+        return WorkWeek(work_week, read_holidays(holidays))
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="'--holidays'")
+
+
 def command_shared_options(fn):
     fn = click.option(
         "--scope",
         "scope",
         default="weekly",
-        type=click.Choice(["weekly", "monthly", "daily"]),
+        type=click.Choice(["weekly", "monthly", "term", "custom", "daily"]),
+        help="Range ending on --date: its week, its month, since --start (term, custom) or the day itself",
+    )(fn)
+    fn = click.option(
+        "--start",
+        "start",
+        type=click.DateTime(formats=["%Y-%m-%d"]),
+        envvar="MBPY_TERM_START",
+        show_envvar=True,
+        help="First day of the range for the term and custom scopes",
     )(fn)
     fn = click.option(
         "--date",
@@ -36,10 +67,113 @@ def command_shared_options(fn):
     fn = click.option(
         "--work-week", type=click.Choice(["mon-fri", "sun-thurs"]), default="mon-fri"
     )(fn)
+    fn = click.option(
+        "--holidays",
+        "holidays",
+        type=click.Path(exists=True, dir_okay=False),
+        envvar="MBPY_HOLIDAYS",
+        show_envvar=True,
+        help="File of days without school, one YYYY-MM-DD or YYYY-MM-DD..YYYY-MM-DD per line",
+    )(fn)
     fn = click.option(
         "-i", "--import/--skip-import", "import_", is_flag=True, default=True
     )(fn)
     fn = click.option("--absent-category-name", 'absent_category_name', default="Absent")(fn)
+    fn = click.option(
+        "--absent-like",
+        "absent_like",
+        multiple=True,
+        help="Further statuses counted with --absent-category-name when ranking the cumulative absences",
+    )(fn)
+    fn = click.option(
+        "--top-absent",
+        "top_absent",
+        type=click.IntRange(min=1),
+        help="Only list this many of the most absent students in the cumulative absences",
+    )(fn)
+    fn = click.option(
+        "--partition-workers",
+        "partition_workers",
+        type=click.IntRange(min=1),
+        default=1,
+        help="How many week sized partitions of the range to fetch at the same time",
+    )(fn)
+    fn = click.option(
+        "--create-indexes",
+        "create_indexes",
+        is_flag=True,
+        help="Create the (date, student_id) indexes on the attendance tables first, if missing",
+    )(fn)
+    fn = click.option(
+        "--cumulative-store",
+        "cumulative_store",
+        type=click.Path(dir_okay=False),
+        envvar="MBPY_CUMULATIVE_STORE",
+        show_envvar=True,
+        help="SQLite file of daily status counts, refreshed for the dates in range on every run",
+    )(fn)
+    fn = click.option(
+        "--cumulative-from",
+        "cumulative_from",
+        type=click.DateTime(formats=["%Y-%m-%d"]),
+        help="Start of the cumulative counts when read from the store, defaults to the report start",
+    )(fn)
+    fn = click.option(
+        "--cache-dir",
+        "cache_dir",
+        type=click.Path(file_okay=False),
+        envvar="MBPY_REPORT_CACHE",
+        show_envvar=True,
+        help="Directory where fetched and derived tables are kept between runs",
+    )(fn)
+    fn = click.option(
+        "--cache-max-size",
+        "cache_max_size",
+        type=click.IntRange(min=1),
+        default=512,
+        show_default=True,
+        help="Megabytes the cache may use before the least recently used entries go",
+    )(fn)
+    fn = click.option(
+        "--cache-max-age",
+        "cache_max_age",
+        type=click.IntRange(min=0),
+        default=0,
+        show_default=True,
+        help="Seconds for which a cached import of the same range is recent enough to skip importing again",
+    )(fn)
+    fn = click.option(
+        "--output-dir",
+        "output_dir",
+        type=click.Path(file_okay=False),
+        help="Also write the raw records and every report table to this directory",
+    )(fn)
+    fn = click.option(
+        "--format",
+        "output_format",
+        type=click.Choice(["parquet", "feather", "csv"]),
+        default="csv",
+        show_default=True,
+        help="File format of the tables written to --output-dir",
+    )(fn)
+    fn = click.option(
+        "--profile",
+        "profile",
+        is_flag=True,
+        help="Print the wall time, rows and peak memory of each phase of the run",
+    )(fn)
+    fn = click.option(
+        "--profile-trace",
+        "profile_trace",
+        type=click.Path(dir_okay=False),
+        help="Also write the phases to this JSON file, implies --profile",
+    )(fn)
+    fn = click.option(
+        "--profile-cprofile",
+        "profile_cprofile",
+        type=click.Path(dir_okay=False),
+        help="Also write cProfile stats of the run to this file, implies --profile",
+    )(fn)
     return fn
 
 
@@ -63,4 +197,18 @@ def smtp_shared_options(fn):
         help="Path to the template",
     )(fn)
     fn = click.option("--manual-status", "manual_statuses", multiple=True)(fn)
+    fn = click.option(
+        "--compression",
+        "compression",
+        type=click.Choice(["gzip", "zip"]),
+        help="Compress the CSV attachments that are not used by the template",
+    )(fn)
+    fn = click.option(
+        "--compress-above",
+        "compress_above",
+        type=click.IntRange(min=0),
+        default=5,
+        show_default=True,
+        help="Megabytes above which those attachments are gzipped when --compression is not given",
+    )(fn)
     return fn
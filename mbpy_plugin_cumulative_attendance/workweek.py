@@ -1,5 +1,8 @@
 from enum import Enum
 from datetime import timedelta
+import functools
+
+import numpy as np
 
 
 class WorkWeekEnum(Enum):
@@ -7,9 +10,43 @@ class WorkWeekEnum(Enum):
     SUN_THURS = "sun-thurs"
 
 
+def as_day(value):
+    """A date, datetime or ISO string as a numpy day"""
+    return np.datetime64(value, "D")
+
+
+def read_holidays(path):
+    """
+    The days listed in path, one YYYY-MM-DD date or YYYY-MM-DD..YYYY-MM-DD
+    range per line, skipping blank lines and # comments
+    """
+    if path is None:
+        return ()
+    days = []
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            first, _, last = line.partition("..")
+            try:
+                days.append(np.arange(as_day(first.strip()), as_day((last or first).strip()) + 1))
+            except ValueError:
+                raise ValueError(
+                    f"{path}, line {number}: expected YYYY-MM-DD or YYYY-MM-DD..YYYY-MM-DD, got {line!r}"
+                ) from None
+    return np.concatenate(days) if days else ()
+
+
 class WorkWeek:
-    def __init__(self, type: str):
+    """
+    The school's working days: its work week, less any holidays, as a numpy
+    business day calendar
+    """
+
+    def __init__(self, type: str, holidays=()):
         self.type = WorkWeekEnum(type)
+        self.holidays = np.unique(np.asarray(holidays, dtype="datetime64[D]"))
 
     def first_day_of_week(self, day):
         if self.type == WorkWeekEnum.MON_FRI:
@@ -19,6 +56,69 @@ class WorkWeek:
 
         return day - timedelta(days=days)
 
+    def start_of_scope(self, scope, end_date, start=None):
+        """First day of the report range that ends on end_date"""
+        if scope == "weekly":
+            return self.first_day_of_week(end_date)
+        elif scope == "monthly":
+            return end_date.replace(day=1)
+        elif scope == "daily":
+            return end_date
+        elif scope in ("term", "custom"):
+            if start is None:
+                raise ValueError(f"the {scope} scope needs a start date")
+            if start.date() > end_date.date():
+                raise ValueError(f"start date {start.date()} is after {end_date.date()}")
+            return start
+        raise NotImplementedError(f"{scope} scope")
+
+    def partitions(self, start_date, end_date):
+        """
+        Week sized (start, end) ranges that together cover the school days from
+        start_date to end_date, leaving out weeks that are all holiday
+        """
+        partition_start = start_date
+        while partition_start.date() <= end_date.date():
+            next_week = self.first_day_of_week(partition_start) + timedelta(days=7)
+            partition_end = min(next_week - timedelta(days=1), end_date)
+            if self.count_school_days(partition_start, partition_end):
+                yield partition_start, partition_end
+            partition_start = next_week
+
+    @property
+    def weekmask(self):
+        """np.busday weekmask, Monday first, of the days school is in session"""
+        return "".join("0" if day in self.weekends else "1" for day in range(7))
+
+    @functools.cached_property
+    def calendar(self):
+        return np.busdaycalendar(weekmask=self.weekmask, holidays=self.holidays)
+
+    def school_days(self, start_date, end_date):
+        """The school days from start_date to end_date, both included, as datetime64[D]"""
+        days = np.arange(as_day(start_date), as_day(end_date) + 1)
+        return days[np.is_busday(days, busdaycal=self.calendar)]
+
+    def school_days_before(self, date, count):
+        """The count school days right before date, as datetime64[D]"""
+        first = np.busday_offset(as_day(date), -count, roll="forward", busdaycal=self.calendar)
+        return self.school_days(first, as_day(date) - 1)
+
+    def count_school_days(self, start_date, end_date):
+        return int(np.busday_count(as_day(start_date), as_day(end_date) + 1, busdaycal=self.calendar))
+
+    def holidays_between(self, start_date, end_date):
+        """Holidays from start_date to end_date that fall on working days, as dates"""
+        days = self.holidays[
+            (self.holidays >= as_day(start_date)) & (self.holidays <= as_day(end_date))
+        ]
+        return days[np.is_busday(days, weekmask=self.weekmask)].tolist()
+
     @property
     def weekends(self):
         return {WorkWeekEnum.MON_FRI: (5, 6), WorkWeekEnum.SUN_THURS: (4, 5)}.get(self.type)
+
+    @property
+    def sql_weekends(self):
+        """Weekend days numbered the way SQL's day of week is, with Sunday as 0"""
+        return tuple((day + 1) % 7 for day in self.weekends)
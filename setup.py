@@ -3,7 +3,8 @@ from setuptools import setup, find_packages
 setup(
     name='mbpy_plugin_cumulative_attendance',
     version='0.4',
-    packages=find_packages(),
+    packages=find_packages(exclude=['tests', 'tests.*']),
+    package_data={'mbpy_plugin_cumulative_attendance': ['templates/*.html']},
     entry_points='''
         [mbpy_plugins]
         cumulative-hr-attendance = mbpy_plugin_cumulative_attendance.homerooms:cli
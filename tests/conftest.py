@@ -0,0 +1,6 @@
+import pathlib
+import sys
+
+## The benchmarks run as scripts that import their helpers as top level
+## modules, and the tests share those helpers the same way
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "benchmarks"))
@@ -0,0 +1,225 @@
+"""
+combo's mismatch tables: pinned against reference CSVs, compared with the
+original join of the homeroom details on Student Id alone, and measured
+against that join for peak memory.
+"""
+import csv
+import pathlib
+import re
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mbpy_plugin_cumulative_attendance.discrepancies import (
+    delim,
+    find_discrepancies,
+    scenarios,
+    write_csvs,
+)
+
+REFERENCE = pathlib.Path(__file__).parent / "data" / "combo"
+
+HOMEROOM_STATUSES = ["Absent", "Late", "Present"]
+CLASS_STATUSES = ["Absent", "Excused", "Late", "Present"]
+NOTES = ["", "sick", 'left early, "nurse"']
+
+
+def attendance_frames(students=12, days=10, periods=4):
+    """
+    Homeroom and class frames laid out like the records functions return
+    them, over days weekdays from 2023-03-06; every status and note is a
+    fixed function of the student, day and period, so the frames never change
+    """
+    dates = pd.bdate_range("2023-03-06", periods=days)
+    homeroom, classes = [], []
+    for student in range(students):
+        attributes = {
+            "Student Id": f"0{student:04}",
+            "Student Name": f"Student {student}",
+            "Grade": f"Grade {6 + student % 3}",
+            "Grade #": 6 + student % 3,
+        }
+        for day, date in enumerate(dates):
+            absent = (student * 7 + day * 3) % 5 == 0
+            late = not absent and (student + day) % 6 == 0
+            homeroom.append(
+                {
+                    **attributes,
+                    "Year Group": f"Year {7 + student % 3}",
+                    "Homeroom Advisor": f"Advisor {student % 4}",
+                    "Date": date,
+                    "Status": "Absent" if absent else "Late" if late else "Present",
+                    "Note": NOTES[(student + day) % 3] if absent or late else "",
+                }
+            )
+            for period in range(1, periods + 1):
+                ## Mostly the homeroom status, with every so many classes disagreeing
+                if absent:
+                    status = "Present" if (student + day + period) % 7 == 0 else "Absent"
+                else:
+                    status = "Absent" if (student * day + period) % 9 == 0 else "Present"
+                if status == "Present" and (student + period) % 11 == 0:
+                    status = "Late"
+                classes.append(
+                    {
+                        **attributes,
+                        "Class": f"Class {(student + period) % 6}",
+                        "Date": date,
+                        "Period": str(period),
+                        "Status": status,
+                        "Note": NOTES[(student + day + period) % 3] if status != "Present" else "",
+                    }
+                )
+
+    homeroom_df = pd.DataFrame(homeroom).astype(
+        {
+            "Status": pd.CategoricalDtype(HOMEROOM_STATUSES),
+            "Grade": "category",
+            "Year Group": "category",
+            "Homeroom Advisor": "category",
+        }
+    )
+    classes_df = pd.DataFrame(classes).astype(
+        {"Status": pd.CategoricalDtype(CLASS_STATUSES), "Grade": "category", "Class": "category"}
+    )
+    return homeroom_df, classes_df
+
+
+def student_only_mismatches(homeroom_df, classes_df, absent_category_name="Absent"):
+    """
+    The mismatch tables as combo built them before, joining the homeroom
+    details on Student Id alone and dropping the duplicates afterwards
+    """
+    on_ = ["Student Id", "Date"]
+    homeroom_df = homeroom_df.astype({"Status": str})
+    classes_df = classes_df.astype({"Status": str, "Class": str})
+    filtered = {
+        "Classes": classes_df,
+        "Homeroom": homeroom_df,
+    }
+    counts = []
+    for source, df in filtered.items():
+        for absent in (False, True):
+            rows = df.loc[(df["Status"] == absent_category_name) == absent]
+            name = f"Count of {source} {'Absent' if absent else 'Not Absent'}"
+            counts.append(rows.groupby(on_).size().reset_index(name=name))
+    combined = counts[0]
+    for count in counts[1:]:
+        combined = pd.merge(combined, count, on=on_, how="outer")
+    combined = combined.fillna(0)
+
+    finals = {}
+    for name, homeroom_column, classes_column in scenarios:
+        homeroom_absent = homeroom_column == "Count of Homeroom Absent"
+        classes_absent = classes_column == "Count of Classes Absent"
+        homeroom_filter = homeroom_df.loc[
+            (homeroom_df["Status"] == absent_category_name) == homeroom_absent
+        ]
+        classes_filter = classes_df.loc[
+            (classes_df["Status"] == absent_category_name) == classes_absent
+        ]
+        first_step = combined.loc[
+            (combined[homeroom_column] == 1.0) & (combined[classes_column] > 0)
+        ]
+
+        summary = first_step.merge(classes_filter, on=on_, how="inner")
+        summary[f"Status{delim}Note"] = np.where(
+            summary["Note"].str.strip() == "",
+            summary["Status"],
+            summary["Status"] + delim + '"' + summary["Note"] + '"',
+        )
+        summary["ClassIndex"] = summary.groupby(on_).cumcount() + 1
+        notes_pivot = summary.pivot(
+            index=on_, columns="ClassIndex", values=f"Status{delim}Note"
+        ).reset_index()
+        notes_pivot.columns = [
+            f"StatusNote{col}" if isinstance(col, int) else col for col in notes_pivot.columns
+        ]
+        class_pivot = summary.pivot(index=on_, columns="ClassIndex", values="Class").reset_index()
+        class_pivot.columns = [
+            f"Class{col}" if isinstance(col, int) else col for col in class_pivot.columns
+        ]
+        total_class_count = classes_df.groupby(on_).size().reset_index(name="Total Classes")
+
+        merged_df = pd.merge(notes_pivot, class_pivot, on=on_)
+        merged_df = pd.merge(merged_df, total_class_count).fillna("")
+        merged_df = merged_df.merge(first_step, on=on_, how="inner")
+        max_index = max(
+            int(re.search(r"\d+", col).group()) for col in merged_df.columns if "StatusNote" in col
+        )
+        extra_columns = [
+            "Student Id",
+            "Student Name",
+            "Year Group",
+            "Homeroom Advisor",
+            "Grade",
+            "Grade #",
+            "Status",
+            "Note",
+        ]
+        merged_df = merged_df.merge(homeroom_filter[extra_columns], on=["Student Id"], how="inner")
+        merged_df["HR Summary"] = np.where(
+            merged_df["Note"].str.strip() == "",
+            merged_df["Status"],
+            merged_df["Status"] + delim + '"' + merged_df["Note"] + '"',
+        )
+        cols_order = (
+            ["Date", *extra_columns[:-2], "HR Summary", "Total Classes", classes_column]
+            + [
+                column
+                for i in range(1, max_index + 1)
+                for column in (f"Class{i}", f"StatusNote{i}")
+            ]
+        )
+        final = merged_df[cols_order]
+        final = final.assign(**{"Student Id": final["Student Id"].map(lambda x: f'="{x}"')})
+        finals[name] = final.drop_duplicates()
+    return finals
+
+
+def peak_bytes(build):
+    tracemalloc.start()
+    try:
+        build()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_mismatch_csvs_match_reference(tmp_path):
+    homeroom_df, classes_df = attendance_frames()
+    write_csvs(find_discrepancies(homeroom_df, classes_df), tmp_path)
+    for name, *_ in scenarios:
+        assert (tmp_path / f"{name}.csv").read_bytes() == (REFERENCE / f"{name}.csv").read_bytes()
+
+
+def test_mismatches_are_the_student_only_join_without_other_days(tmp_path):
+    """
+    Every row the student-only join got right is still there, in the same
+    order; only its copies carrying another day's homeroom status are gone.
+    Numbers are compared by value, since that join counted in floats.
+    """
+    homeroom_df, classes_df = attendance_frames()
+    write_csvs(find_discrepancies(homeroom_df, classes_df), tmp_path)
+    before = student_only_mismatches(homeroom_df, classes_df)
+    for name, *_ in scenarios:
+        with open(tmp_path / f"{name}.csv", newline="") as file:
+            rows = list(csv.reader(file, quoting=csv.QUOTE_NONNUMERIC))
+        old_csv = before[name].to_csv(index=False, quoting=csv.QUOTE_NONNUMERIC)
+        old_rows = list(csv.reader(old_csv.splitlines(), quoting=csv.QUOTE_NONNUMERIC))
+
+        assert rows[0] == old_rows[0]
+        remaining = iter(old_rows[1:])
+        assert all(row in remaining for row in rows[1:])
+        assert {tuple(row[:2]) for row in rows[1:]} == {tuple(row[:2]) for row in old_rows[1:]}
+        assert len(old_rows) > len(rows) > 1
+
+
+@pytest.mark.parametrize("days", [5, 20])
+def test_peak_memory_below_student_only_join(days):
+    homeroom_df, classes_df = attendance_frames(students=300, days=days, periods=6)
+    before = peak_bytes(lambda: student_only_mismatches(homeroom_df, classes_df))
+    after = peak_bytes(lambda: find_discrepancies(homeroom_df, classes_df))
+    assert after < before, f"{after / 1e6:.1f} MB against {before / 1e6:.1f} MB for the student-only join"
@@ -0,0 +1,87 @@
+"""
+Records without a student id, or with other null keys, are left out of the
+counts or kept under their own null key, never coded onto another record's.
+"""
+import pandas as pd
+import pytest
+
+from mbpy_plugin_cumulative_attendance.analytics import attendance_rates
+from mbpy_plugin_cumulative_attendance.attendance_records import with_calendar_columns
+from mbpy_plugin_cumulative_attendance.calculate import build_cumulative_status_is_active
+from mbpy_plugin_cumulative_attendance.class_attendance import ClassAttendance, class_index
+from mbpy_plugin_cumulative_attendance.discrepancies import find_discrepancies, scenarios
+from mbpy_plugin_cumulative_attendance.reports import ReportBuilder
+from mbpy_plugin_cumulative_attendance.utils import multi_index_readable
+
+from .test_combo import attendance_frames
+
+
+def with_nulls(df, **columns):
+    """df with the first row of each given student's records nulled in column"""
+    df = df.astype({column: object for column in columns})
+    for column, student in columns.items():
+        df.loc[(df["Student Id"] == student).idxmax(), column] = None
+    return df
+
+
+def test_cumulative_leaves_out_records_without_a_student_id():
+    _, classes_df = attendance_frames()
+    classes_df = with_nulls(classes_df, **{"Student Id": "00001"})
+    counted = build_cumulative_status_is_active(classes_df).set_index("Student Id")
+    expected = pd.crosstab(classes_df["Student Id"], classes_df["Status"])
+
+    assert counted.index.notna().all()
+    assert sorted(counted.index) == list(expected.index)
+    assert (counted.loc[expected.index, list(expected.columns)].to_numpy() == expected.to_numpy()).all()
+
+
+def test_attendance_rates_leave_out_records_without_a_student_id():
+    homeroom_df, _ = attendance_frames()
+    school_days = homeroom_df["Date"].unique().to_numpy(dtype="datetime64[D]")
+    rates = attendance_rates(with_nulls(homeroom_df, **{"Student Id": "00001"}), school_days)
+    complete = attendance_rates(homeroom_df, school_days).set_index("Student Id")
+
+    assert rates["Student Id"].notna().all()
+    assert len(rates) == len(complete)
+    one_less = rates.set_index("Student Id").loc["00001", "Recorded days"]
+    assert one_less == complete.loc["00001", "Recorded days"] - 1
+
+
+def pivoted_absent_days(classes_df):
+    """The class absent_days table as df.pivot built it"""
+    absent = classes_df.loc[classes_df["Status"] == "Absent"]
+    table = absent.pivot(index=class_index, columns=["Date"], values=["Note"])
+    table = table.fillna("-").replace("", '"Absent"')
+    table = multi_index_readable(table, has_margins=False)
+    table.columns = table.columns.strftime("%Y-%m-%d")
+    return table.sort_index()
+
+
+@pytest.mark.parametrize("column", ["Period", "Student Id"])
+def test_class_tables_keep_null_keys_on_rows_of_their_own(column):
+    _, classes_df = attendance_frames()
+    ## The first record of student 00000 is an absence
+    classes_df = with_calendar_columns(with_nulls(classes_df, **{column: "00000"}))
+    expected = pivoted_absent_days(classes_df)
+
+    assert expected.index.get_level_values(column).isna().sum() == 1
+    for builder in (ClassAttendance(classes_df), ReportBuilder(classes_df, class_index, ["Grade", "Grade #"])):
+        pd.testing.assert_frame_equal(
+            builder.absent_days().sort_index(), expected, check_dtype=False, check_index_type=False
+        )
+
+
+def test_mismatches_leave_out_records_without_a_student_id():
+    """Student 00005's first day, a mismatch, is nulled in both frames"""
+    frames = attendance_frames()
+    first_day = [
+        (df["Student Id"] == "00005") & (df["Date"] == df["Date"].min()) for df in frames
+    ]
+    nulled = [df.astype({"Student Id": object}) for df in frames]
+    for df, rows in zip(nulled, first_day):
+        df.loc[rows, "Student Id"] = None
+    with_null = find_discrepancies(*nulled)
+    without = find_discrepancies(*(df.loc[~rows] for df, rows in zip(frames, first_day)))
+
+    for name, *_ in scenarios:
+        pd.testing.assert_frame_equal(with_null[name], without[name])
@@ -0,0 +1,64 @@
+"""
+Both attendance queries seek on their (date, student_id) index once
+create_attendance_indexes has made it, checked on the EXPLAIN plan of a one
+week report over a small synthetic term.
+"""
+import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from mbpy_plugin_cumulative_attendance.attendance_records import (
+    ATTENDANCE_INDEXES,
+    attendance_indexes,
+    classes_attendance_statement,
+    create_attendance_indexes,
+    explain,
+    homeroom_attendance_statement,
+)
+from mbpy_plugin_cumulative_attendance.workweek import WorkWeek
+
+from synthetic import generate
+
+QUERIES = {
+    "class": (classes_attendance_statement, ATTENDANCE_INDEXES[0][0]),
+    "homeroom": (homeroom_attendance_statement, ATTENDANCE_INDEXES[1][0]),
+}
+
+
+@pytest.fixture(scope="module")
+def term(tmp_path_factory):
+    """A synthetic term and the range of its last week"""
+    path = tmp_path_factory.mktemp("query_plan") / "attendance.sqlite"
+    engine, dates = generate(path, students=60, classes=10, days=20)
+    start_date = datetime.datetime.combine(dates[-5], datetime.time())
+    end_date = datetime.datetime.combine(dates[-1], datetime.time())
+    yield engine, start_date, end_date
+    engine.dispose()
+
+
+def plan(session, statement, start_date, end_date):
+    _, statement = statement(start_date, end_date, WorkWeek("mon-fri"))
+    return [" ".join(str(value) for value in row) for row in explain(session, statement)]
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_query_uses_its_index(term, name):
+    engine, start_date, end_date = term
+    statement, index = QUERIES[name]
+    with Session(engine) as session:
+        for existing in attendance_indexes():
+            existing.drop(session.connection(), checkfirst=True)
+        session.commit()
+        assert not any(index in line for line in plan(session, statement, start_date, end_date))
+
+        create_attendance_indexes(session)
+        lines = plan(session, statement, start_date, end_date)
+        assert any(index in line and "SEARCH" in line for line in lines), lines
+
+
+def test_indexes_stay_out_of_the_shared_metadata():
+    attendance_indexes()
+    metadata = ATTENDANCE_INDEXES[0][1].__table__.metadata
+    names = {index.name for table in metadata.tables.values() for index in table.indexes}
+    assert not names & {name for name, _ in ATTENDANCE_INDEXES}
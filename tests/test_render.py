@@ -0,0 +1,34 @@
+"""
+The rendered report is the body of the message, ahead of the CSV
+attachments, rather than one more part after them.
+"""
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import pandas as pd
+
+from mbpy_plugin_cumulative_attendance.render import attach_report
+from mbpy_plugin_cumulative_attendance.send_email import csv_attachment
+
+
+def test_report_is_the_body_before_the_attachments(tmp_path):
+    template = tmp_path / "report.html"
+    template.write_text("<p>{{ data.subject }}: {{ data.table.rows | length }} students</p>")
+    df = pd.DataFrame({"Absent": [2, 1]}, index=pd.Index(["00001", "00002"], name="Student Id"))
+
+    message = MIMEMultipart()
+    message.attach(csv_attachment("cumulative_absences.csv", df))
+    message.attach(MIMEText("Weekly report", "plain"))
+    attach_report(message, template, df, subject="Week 3")
+    message.attach(csv_attachment("absent_days.csv", df))
+
+    body, *attachments = message.get_payload()
+    assert body.get_content_type() == "multipart/alternative"
+    plain, html = body.get_payload()
+    assert plain.get_payload() == "Weekly report"
+    assert html.get_content_type() == "text/html"
+    assert html.get_payload(decode=True).decode() == "<p>Week 3: 2 students</p>"
+    assert [part.get_filename() for part in attachments] == [
+        "cumulative_absences.csv",
+        "absent_days.csv",
+    ]